@@ -0,0 +1 @@
+"""Shared helpers for the Naviswork clash report pages."""
@@ -0,0 +1,77 @@
+"""Layout benchmark for the clash report tables.
+
+    python -m bimtools.bench_layout [--rows 500 5000 20000] [--max-single 5000]
+
+Builds an A4 "With Note" style report from synthetic rows, once as a single
+Table with repeatRows (the old layout) and once as page sized blocks from
+table_blocks, and prints the build time per mode. The single Table grows
+quadratically, so by default it is skipped above --max-single rows.
+"""
+import argparse
+import time
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle
+
+from bimtools.table_blocks import frame_height, table_blocks
+
+
+def build_doc(output):
+    page_width, page_height = A4
+    doc = BaseDocTemplate(output, pagesize=A4)
+    frame = Frame(0, 0.1 * page_height, page_width, 0.8 * page_height, id='F1')
+    doc.addPageTemplates([PageTemplate('normal', [frame])])
+    return doc
+
+
+def build_rows(count):
+    styles = getSampleStyleSheet()
+    data = [["No.", "Image", "Details", "Note"]]
+    for idx in range(1, count + 1):
+        details = [Paragraph(f"<b>Clash ID:</b> C{idx:05d}", styles["Normal"]),
+                   Paragraph(f"<b>Level:</b> L{idx % 12}", styles["Normal"]),
+                   Paragraph("<b>Description:</b> Duct clashes with beam", styles["Normal"])]
+        note = [Paragraph(f"Note for clash {idx}", styles["Normal"])]
+        # Stands in for the 2.4 inch screenshot so only layout is measured
+        data.append([str(idx), Spacer(2.4 * inch, 2.4 * inch), details, note])
+    return data
+
+
+def run(count, chunked):
+    page_width, _ = A4
+    col_widths = [0.05 * page_width, 0.3 * page_width, 0.3 * page_width, 0.3 * page_width]
+    style = TableStyle([('GRID', (0, 0), (-1, -1), 1, '#2B2B2B'),
+                        ('VALIGN', (0, 0), (-1, -1), 'TOP')])
+    data = build_rows(count)
+    doc = build_doc(BytesIO())
+
+    start = time.perf_counter()
+    if chunked:
+        story = table_blocks(data, col_widths, style, frame_height(doc))
+    else:
+        story = [Table(data, colWidths=col_widths, repeatRows=1, style=style)]
+    doc.build(story)
+    return time.perf_counter() - start, doc.page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[500, 5000, 20000])
+    parser.add_argument('--max-single', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'layout':>8} {'pages':>6} {'seconds':>8} {'ms/row':>7}")
+    for count in args.rows:
+        for chunked in (False, True):
+            if not chunked and count > args.max_single:
+                continue
+            seconds, pages = run(count, chunked)
+            layout = 'blocks' if chunked else 'single'
+            print(f"{count:>7} {layout:>8} {pages:>6} {seconds:>8.2f} {seconds / count * 1000:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Rebase benchmark for viewpoint XML exports.
+
+    python -m bimtools.bench_viewpoints [--views 10000 100000] [--repeat 3]
+
+Builds a Navisworks style viewpoint export from synthetic views, each with
+a camera position and rotation, and rebases it with rewrite_viewpoints,
+once with a plain shift and once with a rotation and unit scale as well,
+which also turns every quaternion. Prints the best time of --repeat runs.
+"""
+import argparse
+import random
+import time
+from io import BytesIO
+
+from bimtools.viewpoint_transform import rewrite_viewpoints, transform_from_pair
+
+
+TRANSFORMS = {
+    'shift': transform_from_pair((1.0, 2.0, 3.0), (10.5, -20.25, 3.125)),
+    'rotate+scale': transform_from_pair((1.0, 2.0, 3.0), (10.5, -20.25, 3.125), rotation=30.0, scale=0.001),
+}
+
+
+def build_export(count):
+    rng = random.Random(5)
+    parts = ['<?xml version="1.0" encoding="UTF-8" ?>\n<exchange units="m">\n <viewpoints>\n'
+             '  <viewfolder name="Benchmark">\n']
+    for idx in range(count):
+        x, y, z = (rng.uniform(-1e5, 1e5) for _ in range(3))
+        parts.append(f'   <view name="View {idx}" guid="{idx:08x}">\n'
+                     f'    <viewpoint tool="none" render="shaded"><camera projection="persp">'
+                     f'<position><pos3f x="{x}" y="{y}" z="{z}"/></position>'
+                     f'<rotation><quaternion a="0.1" b="0.2" c="0.3" d="0.9"/></rotation>'
+                     f'</camera></viewpoint>\n   </view>\n')
+    parts.append('  </viewfolder>\n </viewpoints>\n</exchange>\n')
+    return ''.join(parts).encode()
+
+
+def run(data, transform, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rewrite_viewpoints(BytesIO(data), transform, BytesIO())
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--views', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'views':>7} {'MB':>6} {'transform':>13} {'seconds':>8} {'us/view':>8}")
+    for count in args.views:
+        data = build_export(count)
+        for name, transform in TRANSFORMS.items():
+            seconds = run(data, transform, args.repeat)
+            print(f"{count:>7} {len(data) / 1e6:>6.1f} {name:>13} {seconds:>8.2f} {seconds / count * 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import pandas as pd
+
+
+DATE_COLUMNS = ['Date Found']
+ISO_DATE_PATTERN = r'^(\d{4})-(\d{2})-(\d{2})$'
+
+
+def normalize_dates(values, fallback_formats=()):
+    """Parse a column of Naviswork dates into datetime64 in one pass.
+
+    View names carry YYMMDD, YYYYMMDD or YYYY-MM-DD. All three are rewritten
+    to YYYYMMDD with vectorized string ops and parsed by a single
+    pd.to_datetime call. Values that still fail are tried against
+    fallback_formats (e.g. dates read back from an exported CSV) and
+    anything left over becomes NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    text = values.astype('string').str.strip()
+    compact = text.str.replace(ISO_DATE_PATTERN, r'\1\2\3', regex=True)
+    compact = compact.mask(compact.str.len() == 6, '20' + compact)
+    dates = pd.to_datetime(compact, format='%Y%m%d', errors='coerce')
+
+    for fmt in fallback_formats:
+        missing = dates.isna() & text.notna()
+        if not missing.any():
+            break
+        dates = dates.fillna(pd.to_datetime(text[missing], format=fmt, errors='coerce'))
+    return dates
+
+
+def format_dates(frame, fmt, columns=DATE_COLUMNS):
+    """Return frame with its date columns rendered as text for display or export."""
+    formatted = {
+        col: frame[col].dt.strftime(fmt).fillna('')
+        for col in columns
+        if col in frame.columns and pd.api.types.is_datetime64_any_dtype(frame[col])
+    }
+    return frame.assign(**formatted) if formatted else frame
@@ -0,0 +1,428 @@
+"""Numbered report rows drawn straight onto the canvas.
+
+Every row of the "With Note" reports is a fixed image box next to a short
+list of details, yet through Table each one is measured, split and has its
+paragraphs wrapped again on every page it is drawn. Here a row is laid out
+once into a FixedRow, plain text lines and images at offsets from the top
+left corner of the row, which is what the row cache keeps. A page of such
+rows is a single FixedRows flowable that draws them with one text object.
+
+Rows whose notes run past the rest of the row are left to Platypus and
+go through Table, which also splits them across pages when they are taller
+than one.
+
+The layout is read from ReportLab internals (the resolved Table styles,
+Paragraph line breaks, the canvas text code). They are only used with the
+ReportLab releases in TESTED_REPORTLAB and when they are still there,
+otherwise the layout is not supported and reports use Table;
+tests/test_fixed_rows.py checks the output against Table.
+"""
+import sys
+from io import BytesIO
+
+from reportlab import Version, rl_config
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase.pdfmetrics import getFont, stringWidth
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Flowable, PageBreak, Paragraph, Spacer, Table
+
+from bimtools.pdf_images import TESTED_REPORTLAB, SharedImage, draw_shared_image
+from bimtools.table_blocks import page_bounds
+
+
+# Height given to flowables when wrapping, rows are never split
+MAX_HEIGHT = 0x7fffffff
+# Private attributes of a resolved Table the layout reads
+TABLE_INTERNALS = ('_cellStyles', '_linecmds', '_bkgrndcmds', '_spanCmds', '_rowHeights')
+
+
+def _reportlab_internals():
+    # The canvas and Paragraph internals _draw_text and _paragraph_lines use
+    if Version.split('.')[0] not in TESTED_REPORTLAB:
+        return False
+    canvas = Canvas(BytesIO())
+    paragraph = Paragraph('text', ParagraphStyle('text'))
+    paragraph.wrap(100, 100)
+    return (hasattr(canvas, '_escape') and hasattr(canvas.beginText(), '_code')
+            and hasattr(getattr(paragraph, 'blPara', None), 'lines'))
+
+
+REPORTLAB_INTERNALS = _reportlab_internals()
+
+
+class FixedRow:
+    """Height of a laid out row, its text lines and its images.
+
+    lines are (font name, font size, colour, x, y, text, word space) and
+    images are (SharedImage, x, y), where y is the distance below the top
+    of the row of a text baseline or the bottom of an image. A row is not
+    changed once laid out, drawing only reads it, so the row cache hands
+    the same one to every build.
+    """
+
+    def __init__(self, height, lines, images):
+        self.height = height
+        self.lines = tuple(lines)
+        self.images = tuple(images)
+
+    def payload_size(self):
+        """Bytes held by the row: its text lines and the image data it draws."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.lines) + sys.getsizeof(self.images)
+        for line in self.lines:
+            size += sys.getsizeof(line) + sys.getsizeof(line[5])
+        for image, _, _ in self.images:
+            size += sys.getsizeof(image) + sys.getsizeof(image.data)
+        return size
+
+
+class FixedRowLayout:
+    """A table style resolved for the header and body rows of a numbered table.
+
+    The first column holds the running number, which is drawn per report
+    rather than kept in the rows, and notes, when given, is the column of
+    the notes. supported is False when the style uses anything the direct
+    renderer does not draw or ReportLab is not one it was checked against;
+    use Table then.
+    """
+
+    def __init__(self, header, col_widths, style, notes=None):
+        table = Table([header, [''] * len(header)], colWidths=col_widths, style=style)
+        self.header = list(header)
+        self.col_widths = list(col_widths)
+        self.notes = notes
+        self.width = sum(self.col_widths)
+        self.positions = [sum(self.col_widths[:col]) for col in range(len(self.col_widths))]
+        if not REPORTLAB_INTERNALS or not all(hasattr(table, name) for name in TABLE_INTERNALS):
+            self.supported = False
+            return
+        self.header_styles, self.cell_styles = table._cellStyles
+        self.grid = _grid_line(table._linecmds)
+        self.backgrounds = _backgrounds(table._bkgrndcmds)
+        self.supported = (self.grid is not None and self.backgrounds is not None
+                          and not table._spanCmds
+                          and all(cell.valign == 'TOP' and cell.alignment in ('LEFT', 'CENTER', 'CENTRE', 'RIGHT')
+                                  for cell in self.header_styles + self.cell_styles))
+        table.wrap(self.width, MAX_HEIGHT)
+        self.header_height = table._rowHeights[0]
+        self.number_height = _string_height(1, self.cell_styles[0])
+        self._header_row = None
+
+    def header_row(self):
+        """The header laid out like a row, None if it cannot be drawn directly."""
+        if self._header_row is None:
+            lines, images = [], []
+            heights = [self._cell(value, style, col, lines, images)
+                       for col, (value, style) in enumerate(zip(self.header, self.header_styles))]
+            fits = None not in heights and not images
+            self._header_row = FixedRow(self.header_height, lines, images) if fits else False
+        return self._header_row or None
+
+    def row(self, cells, max_height):
+        """Lay out the cells of one row, without its number.
+
+        Returns None when the notes run past the other cells, when a cell
+        is taller than max_height or holds something other than text,
+        paragraphs, spacers and report images.
+        """
+        if not _truetype(self.cell_styles[0].fontname):
+            return None
+        lines, images = [], []
+        height = self.number_height
+        notes_height = 0
+        for col, value in enumerate(cells, 1):
+            cell_height = self._cell(value, self.cell_styles[col], col, lines, images)
+            if cell_height is None or cell_height > max_height:
+                return None
+            if col == self.notes:
+                notes_height = cell_height
+            else:
+                height = max(height, cell_height)
+        if notes_height > height:
+            return None
+        return FixedRow(height, lines, images)
+
+    def _cell(self, value, style, col, lines, images):
+        x, width = self.positions[col], self.col_widths[col]
+        if isinstance(value, str):
+            if not _truetype(style.fontname):
+                return None
+            texts = value.split("\n")
+            for idx, text in enumerate(texts):
+                lines.append((style.fontname, style.fontsize, style.color,
+                              _string_x(text, x, width, style),
+                              style.topPadding + style.fontsize + idx * style.leading, text, 0))
+            return _string_height(len(texts), style)
+        if isinstance(value, Flowable):
+            value = [value]
+        if not isinstance(value, (list, tuple)):
+            return None
+
+        # Stacked from the top like Table._drawCell, the first flowable's
+        # space before and the last one's space after are dropped
+        inner = width - style.leftPadding - style.rightPadding
+        y = style.topPadding
+        space_after = 0
+        for idx, flowable in enumerate(value):
+            if not isinstance(flowable, (Paragraph, Spacer, SharedImage)):
+                return None
+            w, h = flowable.wrap(inner, MAX_HEIGHT)
+            if idx:
+                y += flowable.getSpaceBefore()
+            flowable_x = _flowable_x(w, x, width, style)
+            if isinstance(flowable, Paragraph):
+                if not _paragraph_lines(flowable, flowable_x, y, lines):
+                    return None
+            elif isinstance(flowable, SharedImage):
+                images.append((flowable, flowable_x, y + h))
+            space_after = flowable.getSpaceAfter()
+            y += h + space_after
+        return y - space_after + style.bottomPadding
+
+    def draw(self, canvas, rows, numbers, height, header=None):
+        # Backgrounds, then text and images, then the grid, like Table.draw
+        header_colour, body_colour = self.backgrounds
+        body_height = height - header.height if header else height
+        if header and header_colour is not None:
+            canvas.setFillColor(header_colour)
+            canvas.rect(0, body_height, self.width, header.height, stroke=0, fill=1)
+        if body_colour is not None:
+            canvas.setFillColor(body_colour)
+            canvas.rect(0, 0, self.width, body_height, stroke=0, fill=1)
+
+        number_style = self.cell_styles[0]
+        tops = []
+        top = body_height
+        for row in rows:
+            tops.append(top)
+            top -= row.height
+        placed = [(height, header.lines)] if header else []
+        for number, top, row in zip(numbers, tops, rows):
+            placed.append((top, [(number_style.fontname, number_style.fontsize, number_style.color,
+                                  _string_x(number, 0, self.col_widths[0], number_style),
+                                  number_style.topPadding + number_style.fontsize, number, 0)]))
+            placed.append((top, row.lines))
+        _draw_text(canvas, placed)
+
+        for top, row in zip(tops, rows):
+            for image, x, y in row.images:
+                draw_shared_image(canvas, image.name, image.data, x, top - y, image.width, image.height)
+
+        weight, colour, cap, join = self.grid
+        canvas.setLineWidth(weight)
+        canvas.setStrokeColor(colour)
+        canvas.setLineCap(cap)
+        canvas.setLineJoin(join)
+        edges = self.positions + [self.width]
+        canvas.lines([(0, y, self.width, y) for y in [height] + tops + [0]]
+                     + [(x, 0, x, height) for x in edges])
+
+
+class FixedRows(Flowable):
+    """Consecutive laid out rows, drawn without going through Table.
+
+    With header (the layout's header_row()), the header is drawn above them.
+    """
+
+    def __init__(self, layout, rows, numbers, header=None):
+        super().__init__()
+        self.layout = layout
+        self.rows = rows
+        self.numbers = numbers
+        self.header = header
+        self.width = layout.width
+        self.height = sum(row.height for row in rows) + (header.height if header else 0)
+        # Placed in the frame like a Table
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.layout.draw(self.canv, self.rows, self.numbers, self.height, self.header)
+
+
+def fixed_row_blocks(header, rows, heights, start, layout, style, block_height):
+    """Story of page sized blocks for rows numbered from start.
+
+    rows are FixedRow layouts, with their height in heights, or the cells
+    of rows left to Platypus, whose height is measured here when it is None.
+    Each page starts with the header, laid out rows are drawn as FixedRows
+    and the others as Tables; a row taller than a page gets a Table of its
+    own that splits inside the row.
+    """
+    numbers = [str(idx) for idx in range(start, start + len(rows))]
+    unknown = [pos for pos, height in enumerate(heights) if height is None]
+    if unknown:
+        measured = Table([header] + [[numbers[pos]] + rows[pos] for pos in unknown],
+                         colWidths=layout.col_widths, style=style)
+        measured.wrap(layout.width, block_height)
+        for pos, height in zip(unknown, measured._rowHeights[1:]):
+            heights[pos] = height
+    header_height = layout.header_height
+    body_style = _body_style(style)
+
+    pages = [range(start, end) for start, end in page_bounds(heights, header_height, block_height)]
+
+    # Pages starting with laid out rows draw the header along with them,
+    # the others share one header Table
+    header_row = layout.header_row()
+    header_table = Table([header], colWidths=layout.col_widths, rowHeights=[header_height],
+                         repeatRows=1, style=style)
+    story = []
+    for page in pages:
+        if story:
+            story.append(PageBreak())
+        if len(page) == 1 and header_height + heights[page[0]] > block_height:
+            pos = page[0]
+            story.append(Table([header, [numbers[pos]] + rows[pos]], colWidths=layout.col_widths,
+                               repeatRows=1, splitInRow=1, style=style))
+            continue
+        runs = list(_runs(page, rows))
+        draw_header = header_row is not None and runs and runs[0][0]
+        if not draw_header:
+            story.append(header_table)
+        for idx, (fixed, group) in enumerate(runs):
+            if fixed:
+                story.append(FixedRows(layout, [rows[pos] for pos in group], [numbers[pos] for pos in group],
+                                       header_row if draw_header and not idx else None))
+            else:
+                story.append(Table([[numbers[pos]] + rows[pos] for pos in group], colWidths=layout.col_widths,
+                                   rowHeights=[heights[pos] for pos in group], style=body_style))
+    return story
+
+
+def _runs(page, rows):
+    # Consecutive positions on a page, grouped by whether they are laid out
+    group, fixed = [], None
+    for pos in page:
+        is_fixed = isinstance(rows[pos], FixedRow)
+        if group and is_fixed != fixed:
+            yield fixed, group
+            group = []
+        group.append(pos)
+        fixed = is_fixed
+    if group:
+        yield fixed, group
+
+
+def _draw_text(canvas, placed):
+    # What PDFTextObject.textOut writes for TrueType fonts, in one text
+    # object, without working out the width of every line to move the
+    # cursor along; the origin of each line is set absolutely instead
+    doc = canvas._doc
+    text = canvas.beginText()
+    code = text._code
+    colour = font_op = None
+    for top, lines in placed:
+        for font_name, font_size, line_colour, x, y, line, word_space in lines:
+            if line_colour != colour:
+                colour = line_colour
+                text.setFillColor(colour)
+            code.append(f"1 0 0 1 {x:.2f} {top - y:.2f} Tm")
+            if word_space:
+                code.append(f"{word_space:.3f} Tw")
+            font = getFont(font_name)
+            for subset, chunk in font.splitString(line, doc):
+                line_font = f"{font.getSubsetInternalName(subset, doc)} {font_size} Tf"
+                if line_font != font_op:
+                    font_op = line_font
+                    code.append(font_op)
+                code.append(f"({canvas._escape(chunk)}) Tj")
+            if word_space:
+                code.append("0 Tw")
+    canvas.drawText(text)
+
+
+def _paragraph_lines(paragraph, x, y, lines):
+    # Only single style, left aligned paragraphs without decorations; the
+    # rest is left to Paragraph.drawOn through Table
+    style = paragraph.style
+    para = paragraph.blPara
+    if (para.kind != 0 or style.alignment != TA_LEFT or paragraph.bulletText
+            or style.backColor or (style.borderWidth and style.borderColor)
+            or getattr(paragraph, '_offsets', None) or getattr(para, 'us_lines', None)
+            or getattr(para, 'link', None) or getattr(paragraph, 'autoLeading', getattr(style, 'autoLeading', ''))
+            or not _truetype(para.fontName)):
+        return False
+    baseline = y + (para.fontSize if rl_config.paraFontSizeHeightOffset else para.ascent)
+    offset = style.firstLineIndent
+    for extra_space, words in para.lines:
+        text = ' '.join(words)
+        # Paragraph squeezes the word spacing of overfull lines
+        spaces = len(words) + text.count('\xa0') - 1
+        word_space = extra_space / spaces if extra_space < -1e-8 and spaces > 0 else 0
+        lines.append((para.fontName, para.fontSize, para.textColor,
+                      x + style.leftIndent + offset, baseline, text, word_space))
+        baseline += style.leading
+        offset = 0
+    return True
+
+
+def _truetype(font_name):
+    # _draw_text writes text the way it is written for TrueType fonts
+    return getFont(font_name)._dynamicFont
+
+
+def _string_height(count, style):
+    return (style.leading or 1.2 * style.fontsize) * count + style.topPadding + style.bottomPadding
+
+
+def _string_x(text, x, width, style):
+    if style.alignment == 'LEFT':
+        return x + style.leftPadding
+    text_width = stringWidth(text, style.fontname, style.fontsize)
+    if style.alignment == 'RIGHT':
+        return x + width - style.rightPadding - text_width
+    return x + (width + style.leftPadding - style.rightPadding) * 0.5 - text_width * 0.5
+
+
+def _flowable_x(w, x, width, style):
+    if style.alignment == 'LEFT':
+        return x + style.leftPadding
+    if style.alignment == 'RIGHT':
+        return x + width - style.rightPadding - w
+    return x + (width + style.leftPadding - style.rightPadding - w) / 2.0
+
+
+def _grid_line(line_commands):
+    # A single GRID over the whole table, as (weight, colour, cap, join)
+    if len(line_commands) != 1:
+        return None
+    op, start, end, weight, colour, cap, dash, join, count, space = line_commands[0]
+    if op != 'GRID' or tuple(start) != (0, 0) or tuple(end) != (-1, -1) or dash or count != 1:
+        return None
+    return weight, colors.toColor(colour), cap, join
+
+
+def _backgrounds(background_commands):
+    # Plain colours behind the header and behind every body row, each None
+    # when not set; None for anything else
+    colours = [None, None]
+    for op, start, end, *args in background_commands:
+        band = {((0, 0), (-1, 0)): 0, ((0, 1), (-1, -1)): 1}.get((tuple(start), tuple(end)))
+        # Gradients are given as lists, only plain colours are drawn here
+        if op != 'BACKGROUND' or band is None or not isinstance(args[0], (str, colors.Color)):
+            return None
+        colours[band] = colors.toColor(args[0], None)
+        if colours[band] is None:
+            return None
+    return tuple(colours)
+
+
+def _body_style(style):
+    # The style's commands for a table of body rows only: header only
+    # commands are dropped and row indexes move up by one
+    commands = []
+    for command in getattr(style, 'getCommands', lambda: style)():
+        op, (start_col, start_row), (end_col, end_row) = command[:3]
+        if isinstance(start_row, str) or isinstance(end_row, str):
+            commands.append(command)
+            continue
+        if end_row == 0:
+            continue
+        start_row = max(start_row - 1, 0) if start_row >= 0 else start_row
+        end_row = end_row - 1 if end_row > 0 else end_row
+        commands.append((op, (start_col, start_row), (end_col, end_row)) + tuple(command[3:]))
+    return commands
@@ -0,0 +1,108 @@
+from collections import deque, namedtuple
+from itertools import chain
+
+import pandas as pd
+from lxml import etree
+
+
+REPORT_COLUMNS = ['Clash ID', 'View Name', 'Image']
+CHUNK_SIZE = 1 << 20
+
+# All views, plan views and section views of a Naviswork viewpoint report
+ReportTables = namedtuple('ReportTables', ['views', 'plans', 'sections'])
+
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """Yield the report as UTF-8 byte chunks from a file, bytes or str."""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size].encode('utf-8')
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size].tobytes()
+        return
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def iter_view_images(source, chunk_size=CHUNK_SIZE):
+    """Yield (view name, image filename) for every h2 heading in the report.
+
+    The report is fed to lxml in chunks and elements are dropped as soon as
+    they are read, so memory stays bounded by the largest single heading
+    rather than the size of the export.
+    """
+    parser = etree.HTMLPullParser(
+        events=('start', 'end'), tag=('h2', 'img'), encoding='utf-8')
+    # Headings are emitted in document order as [view name, image, matched]
+    # slots. A slot waits for its closing tag and for the first image after
+    # the h2 starts, same as BeautifulSoup's h2.find_next('img').
+    queue = deque()
+    without_image = []
+    open_headings = []
+
+    def drain(events):
+        for event, element in events:
+            if element.tag == 'h2':
+                if event == 'start':
+                    slot = [None, None, False]
+                    queue.append(slot)
+                    without_image.append(slot)
+                    open_headings.append(slot)
+                else:
+                    open_headings.pop()[0] = ''.join(element.itertext()).strip()
+            elif element.tag == 'img' and event == 'start':
+                src = element.get('src')
+                img_src = src.split('/')[-1] if src else None
+                for slot in without_image:
+                    slot[1], slot[2] = img_src, True
+                without_image.clear()
+
+            # Drop everything read so far, except the text of an open heading
+            if event == 'end' and not open_headings:
+                element.clear()
+                for node in chain((element,), element.iterancestors()):
+                    while node.getprevious() is not None:
+                        del node.getparent()[0]
+
+            while queue and queue[0][0] is not None and queue[0][2]:
+                view_name, img_src, _ = queue.popleft()
+                yield view_name, img_src
+
+    for chunk in iter_chunks(source, chunk_size):
+        parser.feed(chunk)
+        yield from drain(parser.read_events())
+    parser.close()
+    yield from drain(parser.read_events())
+
+    for view_name, img_src, _ in queue:
+        if view_name is not None:
+            yield view_name, img_src
+
+
+def read_report_tables(source):
+    """Parse the report once and return the view, plan and section tables."""
+    views, plans, sections = [], [], []
+    for view_name, img_src in iter_view_images(source):
+        row = (view_name.split('_')[0], view_name, img_src)
+        views.append(row)
+        if '(Plan)' in view_name:
+            plans.append(row)
+        if '(Section)' in view_name:
+            sections.append(row)
+
+    return ReportTables(
+        views=pd.DataFrame(views, columns=REPORT_COLUMNS),
+        plans=pd.DataFrame(plans, columns=REPORT_COLUMNS),
+        sections=pd.DataFrame(sections, columns=REPORT_COLUMNS),
+    )
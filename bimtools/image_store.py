@@ -0,0 +1,115 @@
+import threading
+import zipfile
+from collections import namedtuple
+from collections.abc import Mapping
+from io import BytesIO
+
+import pandas as pd
+
+from bimtools.parse_cache import file_digest
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+ZIP_TYPES = ('application/zip', 'application/x-zip-compressed')
+IMAGE_TYPES = ('image/jpeg', 'image/jpg', 'image/png')
+
+
+class ImageStore(Mapping):
+    """Uploaded screenshots by file name, decompressed only when asked for.
+
+    Adding a ZIP reads its central directory straight from the upload
+    buffer; nothing is written to disk and no entry is inflated until it is
+    looked up. Each image is inflated once and the same BytesIO is handed
+    out afterwards, so callers seek(0) before reading as they always have.
+    Names are the base file name, as the report's img src refers to them.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.loaded = {}
+        self.lock = threading.Lock()
+        # MIME types of uploads that were neither a ZIP nor an image
+        self.unsupported = []
+
+    def add_upload(self, uploaded_file):
+        if uploaded_file.type in ZIP_TYPES:
+            self.add_zip(uploaded_file)
+        elif uploaded_file.type in IMAGE_TYPES:
+            self.add_file(uploaded_file)
+        else:
+            self.unsupported.append(uploaded_file.type)
+
+    def add_zip(self, uploaded_file):
+        archive = zipfile.ZipFile(uploaded_file)
+        for info in archive.infolist():
+            name = info.filename.rsplit('/', 1)[-1]
+            if not info.is_dir() and name.lower().endswith(IMAGE_EXTENSIONS):
+                self.entries[name] = (archive, info)
+                self.loaded.pop(name, None)
+
+    def add_file(self, uploaded_file):
+        self.entries[uploaded_file.name] = uploaded_file
+        self.loaded[uploaded_file.name] = uploaded_file
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self.loaded:
+                archive, info = self.entries[name]
+                self.loaded[name] = BytesIO(archive.read(info))
+            return self.loaded[name]
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def session_image_store(uploaded_files, state, key='image_store'):
+    """ImageStore of the uploaded images and ZIPs, kept in state between reruns.
+
+    state is st.session_state. The store is reused for as long as the same
+    uploads are selected, so each image is inflated once per upload rather
+    than on every widget interaction. Uploads are told apart by their
+    Streamlit file id, or by their SHA-256 when they have none.
+    """
+    uploads = tuple((getattr(uploaded, 'file_id', None) or file_digest(uploaded), uploaded.name)
+                    for uploaded in uploaded_files)
+    kept = state.get(key)
+    if kept is not None and kept[0] == uploads:
+        return kept[1]
+    store = ImageStore()
+    for uploaded in uploaded_files:
+        store.add_upload(uploaded)
+    state[key] = (uploads, store)
+    return store
+
+
+# Image names the report asks for, those with no uploaded file and uploaded
+# files no row refers to
+ImageUsage = namedtuple('ImageUsage', ['referenced', 'missing', 'unused'])
+
+
+def referenced_images(frame, columns):
+    names = pd.unique(frame[columns].to_numpy().ravel())
+    return {name for name in names if isinstance(name, str)}
+
+
+def resolve_images(frame, store, columns, not_found="Image not found"):
+    """Swap image names in columns for their BytesIO from store.
+
+    Only names the report actually refers to are looked up, so only those
+    entries are ever inflated. Returns (frame, ImageUsage).
+    """
+    referenced = referenced_images(frame, columns)
+    found = {name: store[name] for name in referenced if name in store}
+    resolved = {col: frame[col].map(found).fillna(not_found) for col in columns}
+    usage = ImageUsage(
+        referenced=sorted(referenced),
+        missing=sorted(referenced - found.keys()),
+        unused=sorted(set(store) - referenced),
+    )
+    return frame.assign(**resolved), usage
@@ -0,0 +1,138 @@
+from functools import partial
+
+import streamlit as st
+
+from bimtools.jobs import CANCELLED, DONE, FAILED, current_job, report_jobs
+from bimtools.report_output import ReportFile
+from bimtools.sharding import render_sharded
+from bimtools.thumbnails import DEFAULT_IMAGE_QUALITY, ImageQuality
+
+
+# Seconds between progress refreshes while a report is building
+POLL_SECONDS = 2
+
+
+def queue_report(render, df, project_name, file_name, images=None, **options):
+    """Build a report in the job queue instead of inside the script run.
+
+    The session only keeps the job id, so the build carries on across
+    reruns and the finished PDF is picked up from show_report_jobs().
+    options go to render_sharded; images use the session's image quality.
+    When df still holds image file names, pass the uploads by name as
+    images and the template swaps them in first (see with_images).
+    """
+    if images is not None:
+        df = render.with_images(df, images)
+    options.setdefault('image_quality', report_image_quality())
+    job_id = report_jobs.submit(build_report, render, df.copy(), project_name,
+                                label=file_name, rows_total=len(df), **options)
+    st.session_state.setdefault('report_jobs', []).append(job_id)
+
+
+def build_report(render, df, project_name, **options):
+    """render_sharded into a ReportFile, plus the image sizes shown next to
+    the download.
+
+    The PDF spills to a temporary file past SPOOL_BYTES, so finished reports
+    waiting for download do not all sit in memory.
+    """
+    pdf = ReportFile()
+    try:
+        render_sharded(render, df, project_name, output=pdf, **options)
+    except BaseException:
+        pdf.close()
+        raise
+    job = current_job()
+    if job is not None and hasattr(render, 'image_sizes'):
+        job.image_bytes = render.image_sizes(df, options['image_quality'])
+    return pdf
+
+
+def report_image_quality():
+    """Image DPI and JPEG quality picked in image_quality_options()."""
+    return ImageQuality(st.session_state.get('report_image_dpi', DEFAULT_IMAGE_QUALITY.dpi),
+                        st.session_state.get('report_jpeg_quality', DEFAULT_IMAGE_QUALITY.jpeg_quality))
+
+
+def image_quality_options():
+    with st.expander("Report image quality"):
+        st.number_input("Target DPI", min_value=50, max_value=600, step=25,
+                        value=DEFAULT_IMAGE_QUALITY.dpi, key='report_image_dpi')
+        st.slider("JPEG quality", min_value=30, max_value=95,
+                  value=DEFAULT_IMAGE_QUALITY.jpeg_quality, key='report_jpeg_quality')
+    return report_image_quality()
+
+
+def image_size_text(image_bytes):
+    before, after = image_bytes
+    return f"Images: {format_bytes(before)} uploaded, {format_bytes(after)} embedded"
+
+
+def report_reader(job_id):
+    # Opened when the download is requested rather than on every rerun, and
+    # read by download_button straight from the report file
+    job = report_jobs.get(job_id)
+    if job is None or job.status != DONE:
+        return b""
+    return job.result.reader()
+
+
+def format_bytes(size):
+    if size < 1e6:
+        return f"{size / 1e3:.0f} KB"
+    return f"{size / 1e6:.1f} MB"
+
+
+def show_report_jobs():
+    """Image options, then progress, cancel and download for queued reports."""
+    image_quality_options()
+    job_ids = [job_id for job_id in st.session_state.get('report_jobs', [])
+               if report_jobs.get(job_id) is not None]
+    st.session_state.report_jobs = job_ids
+    if not job_ids:
+        return
+
+    building = any(not report_jobs.get(job_id).finished for job_id in job_ids)
+    st.session_state.report_jobs_polling = building
+    st.fragment(_report_job_list, run_every=POLL_SECONDS if building else None)()
+
+
+def _report_job_list():
+    st.subheader("Reports")
+    building = False
+    for job_id in st.session_state.report_jobs:
+        job = report_jobs.get(job_id)
+        if job is None:
+            continue
+        if job.status == DONE:
+            st.download_button(
+                label=f"Download {job.label} ({format_bytes(job.result.size)})",
+                data=partial(report_reader, job_id),
+                file_name=job.label,
+                mime="application/pdf",
+                key=f"download_{job_id}",
+                on_click='ignore'
+            )
+            if job.image_bytes:
+                st.caption(image_size_text(job.image_bytes))
+            st.button("Dismiss", key=f"dismiss_{job_id}", on_click=report_jobs.discard, args=(job_id,))
+        elif job.status == FAILED:
+            st.error(f"{job.label} failed")
+            with st.expander("Details"):
+                st.code(job.error)
+            st.button("Dismiss", key=f"dismiss_{job_id}", on_click=report_jobs.discard, args=(job_id,))
+        elif job.status == CANCELLED:
+            st.write(f"{job.label} cancelled")
+            st.button("Dismiss", key=f"dismiss_{job_id}", on_click=report_jobs.discard, args=(job_id,))
+        else:
+            building = True
+            fraction = min(1.0, job.rows_done / job.rows_total) if job.rows_total else 0.0
+            st.progress(fraction, text=f"{job.label}: {job.status}, {job.rows_done}/{job.rows_total} rows, "
+                                       f"{job.pages_done} pages")
+            st.button("Cancel", key=f"cancel_{job_id}", on_click=report_jobs.cancel, args=(job_id,))
+
+    # The refresh interval is fixed when the fragment is created, so a full
+    # rerun is needed to stop polling once everything has finished
+    if st.session_state.get('report_jobs_polling') and not building:
+        st.session_state.report_jobs_polling = False
+        st.rerun()
@@ -0,0 +1,153 @@
+import itertools
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from reportlab.platypus import BaseDocTemplate, Table
+
+from bimtools.fixed_rows import FixedRows
+
+
+# Reports built at the same time across all sessions, BIM_JOB_WORKERS overrides
+JOB_WORKERS = int(os.environ.get('BIM_JOB_WORKERS', 2))
+# Finished jobs kept for download before the oldest are dropped
+MAX_FINISHED_JOBS = 32
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, label, rows_total):
+        self.id = job_id
+        self.label = label
+        self.status = QUEUED
+        self.rows_total = rows_total
+        self.rows_done = 0
+        self.pages_done = 0
+        # (uploaded, embedded) bytes of the report's images, when known
+        self.image_bytes = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def release(self):
+        # Results spooled to a file (ReportFile) free it when the job goes
+        if hasattr(self.result, 'close'):
+            self.result.close()
+
+
+_local = threading.local()
+
+
+def current_job():
+    """The job running on this thread, or None outside the job queue."""
+    return getattr(_local, 'job', None)
+
+
+class JobManager:
+    """Process-wide queue of report builds shared by every session.
+
+    Jobs run on a small thread pool so a build survives Streamlit reruns;
+    sessions only hold on to job ids. Finished results stay here until
+    discarded or pushed out by newer finished jobs.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-job')
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, label='', rows_total=0, **kwargs):
+        with self.lock:
+            job = Job(f"job-{next(self.ids)}", label, rows_total)
+            self.jobs[job.id] = job
+        self.pool.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            return
+        job.status = RUNNING
+        _local.job = job
+        try:
+            job.result = func(*args, **kwargs)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception:
+            job.error = traceback.format_exc()
+            job.status = FAILED
+        finally:
+            _local.job = None
+            self._evict()
+
+    def _evict(self):
+        with self.lock:
+            finished = sorted((job for job in self.jobs.values() if job.finished),
+                              key=lambda job: job.created)
+            evicted = finished[:max(0, len(finished) - self.max_finished)]
+            for job in evicted:
+                del self.jobs[job.id]
+        for job in evicted:
+            job.release()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+
+    def discard(self, job_id):
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+        if job is not None:
+            job.cancel_event.set()
+            job.release()
+
+
+report_jobs = JobManager()
+
+
+class ProgressDocTemplate(BaseDocTemplate):
+    """BaseDocTemplate that reports rows and pages laid out to the running job.
+
+    Cancelling the job stops the build at the next table block or page.
+    Outside the job queue it behaves exactly like BaseDocTemplate.
+    """
+
+    def afterFlowable(self, flowable):
+        job = current_job()
+        if job is None:
+            return
+        if isinstance(flowable, Table):
+            job.rows_done += flowable._nrows - flowable.repeatRows
+        elif isinstance(flowable, FixedRows):
+            job.rows_done += len(flowable.rows)
+        job.check_cancelled()
+
+    def afterPage(self):
+        job = current_job()
+        if job is None:
+            return
+        job.pages_done += 1
+        job.check_cancelled()
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+MAX_CACHE_ENTRIES = 16
+DIGEST_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(uploaded_file):
+    """SHA-256 of an uploaded file, read without moving its position."""
+    sha = hashlib.sha256()
+    if hasattr(uploaded_file, 'getbuffer'):
+        sha.update(uploaded_file.getbuffer())
+        return sha.hexdigest()
+
+    position = uploaded_file.tell()
+    uploaded_file.seek(0)
+    for chunk in iter(lambda: uploaded_file.read(DIGEST_CHUNK_SIZE), b''):
+        sha.update(chunk)
+    uploaded_file.seek(position)
+    return sha.hexdigest()
+
+
+def hold_across_fork(lock):
+    """Take lock around every os.fork() and return it.
+
+    A forked child only has the thread that forked it, so a lock some other
+    thread held at that moment would stay taken in the child for good. For
+    locks that live as long as the process: the hooks cannot be removed,
+    and the lock must not be held while another such lock is taken.
+    """
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(before=lock.acquire, after_in_parent=lock.release,
+                            after_in_child=lock.release)
+    return lock
+
+
+def estimate_size(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def copy_value(value):
+    # Pages add and overwrite columns in place, so never hand out the cached frame
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(copy_value(item) for item in value)
+    if isinstance(value, list):
+        return [copy_value(item) for item in value]
+    return value
+
+
+class ParseCache:
+    """Process-wide LRU of parsed uploads, bounded by entries and bytes.
+
+    Caches are made once per process; their lock is held across forks, so
+    forked report workers can use them (see hold_across_fork).
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES, size=estimate_size):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        # Bytes an entry counts for against max_bytes
+        self.size = size
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+        self.lock = hold_across_fork(threading.Lock())
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return copy_value(self.entries[key][0])
+
+    def put(self, key, value):
+        size = self.size(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            while (len(self.entries) > self.max_entries
+                   or self.total_bytes > self.max_bytes):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def get_or_create(self, key, create):
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.put(key, value)
+            value = copy_value(value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+parse_cache = ParseCache()
+
+
+def cached_parse(profile, uploaded_files, parse):
+    """Return parse(*uploaded_files), reusing the result while the bytes are unchanged.
+
+    The key is the project profile plus the SHA-256 of every uploaded file,
+    so widget reruns skip the parse and a new upload always misses.
+    """
+    key = (profile,) + tuple(file_digest(f) for f in uploaded_files)
+    return parse_cache.get_or_create(key, lambda: parse(*uploaded_files))
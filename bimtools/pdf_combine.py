@@ -0,0 +1,56 @@
+import io
+
+from PyPDF2 import PdfReader, PdfWriter
+
+
+def combine_pdfs(uploaded_files, share_images=False, output=None):
+    """Concatenate the pages of several PDFs into one.
+
+    The result is written to output when given (e.g. a ReportFile) and to a
+    new BytesIO otherwise; either is returned rewound.
+
+    With share_images, image XObjects with the same resource name are
+    written once and referenced from every page that uses them. That is only
+    safe for PDFs whose image names follow their content, like the report
+    shards, where the logo and a plan repeated across shards would
+    otherwise be stored once per shard.
+    """
+    merger = PdfWriter()
+    shared = {}
+
+    for file in uploaded_files:
+        pdf = PdfReader(file)
+        for page in pdf.pages:
+            if share_images:
+                _use_shared_images(page, shared)
+            page = merger.add_page(page)
+            if share_images:
+                _remember_images(page, shared)
+
+    combined_pdf_stream = io.BytesIO() if output is None else output
+    merger.write(combined_pdf_stream)
+    combined_pdf_stream.seek(0)
+
+    return combined_pdf_stream
+
+
+def _page_images(page):
+    resources = page.get('/Resources')
+    if resources is None:
+        return {}
+    return resources.get_object().get('/XObject', {}).get_object()
+
+
+def _use_shared_images(page, shared):
+    # Pointing the page at an object the writer already holds keeps
+    # add_page from copying this file's duplicate of it
+    images = _page_images(page)
+    for name in list(images):
+        if name in shared:
+            images[name] = shared[name]
+
+
+def _remember_images(page, shared):
+    images = _page_images(page)
+    for name in images:
+        shared.setdefault(name, images.raw_get(name))
@@ -0,0 +1,147 @@
+import zlib
+from io import BytesIO
+
+from reportlab import Version
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfbase.pdfutils import readJPEGInfo
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Flowable
+
+from bimtools.thumbnails import DEFAULT_IMAGE_QUALITY, pdf_variant
+
+
+# Major ReportLab versions whose internals were checked against this module
+# and fixed_rows
+TESTED_REPORTLAB = ('5',)
+
+
+def _reportlab_internals():
+    # What draw_shared_image takes from Canvas and PDFDocument to register
+    # an XObject the way Canvas.drawImage does
+    if Version.split('.')[0] not in TESTED_REPORTLAB:
+        return False
+    canvas = Canvas(BytesIO())
+    doc = canvas._doc
+    return (all(hasattr(canvas, name) for name in ('_setXObjects', '_code', '_formsinuse'))
+            and all(hasattr(doc, name) for name in ('getXObjectName', 'idToObject', 'Reference', 'addForm')))
+
+
+REPORTLAB_INTERNALS = _reportlab_internals()
+
+
+class SharedImage(Flowable):
+    """An image embedded once per document under a name given by its content.
+
+    Canvas.drawImage names an image by hashing its decoded pixels, so every
+    occurrence is decoded just to find it was embedded already, and the
+    reader keeps those pixels for as long as the flowable lives (cached rows
+    live across reruns). Here the name comes with the encoded bytes (see
+    thumbnails.pdf_variant) and nothing is decoded until the image is first
+    drawn in a document. Same-named images are also shared when shards are
+    stitched together, see combine_pdfs.
+    """
+    _fixedWidth = 1
+    _fixedHeight = 1
+
+    def __init__(self, name, data, width, height, hAlign='CENTER'):
+        self.name = name
+        self.data = data
+        self.width = width
+        self.height = height
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        draw_shared_image(self.canv, self.name, self.data, 0, 0, self.width, self.height)
+
+
+def shared_image(image, points, image_quality=DEFAULT_IMAGE_QUALITY):
+    """SharedImage of an upload drawn `points` square, None if it is not an image."""
+    variant = pdf_variant(image, points, image_quality)
+    if variant is None:
+        return None
+    name, data = variant
+    return SharedImage(name, data, points, points)
+
+
+def draw_shared_image(canvas, name, data, x, y, width, height):
+    """Draw the encoded image data as the XObject called name.
+
+    The XObject is registered the way Canvas.drawImage does, under this name
+    instead of the digest of its pixels. That takes Canvas and PDFDocument
+    internals, so with a ReportLab other than TESTED_REPORTLAB, or when they
+    are gone, drawImage names and embeds the image instead.
+    """
+    if not REPORTLAB_INTERNALS:
+        canvas.drawImage(ImageReader(BytesIO(data)), x, y, width, height, mask='auto')
+        return
+    doc = canvas._doc
+    reg_name = doc.getXObjectName(name)
+    if not doc.idToObject.get(reg_name):
+        xobject = BinaryImageXObject(name, ImageReader(BytesIO(data)), mask='auto')
+        canvas._setXObjects(xobject)
+        doc.Reference(xobject, reg_name)
+        doc.addForm(name, xobject)
+        smask = getattr(xobject, '_smask', None)
+        if smask:
+            mask_name = doc.getXObjectName(smask.name)
+            if not doc.idToObject.get(mask_name):
+                canvas._setXObjects(smask)
+                xobject.smask = doc.Reference(smask, mask_name)
+            else:
+                xobject.smask = pdfdoc.PDFObjectReference(mask_name)
+            del xobject._smask
+
+    canvas._currentPageHasImages = 1
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.scale(width, height)
+    canvas._code.append("/%s Do" % reg_name)
+    canvas.restoreState()
+    canvas._formsinuse.append(name)
+
+
+class BinaryImageXObject(pdfdoc.PDFImageXObject):
+    """An image XObject whose stream is always written as binary.
+
+    PDFImageXObject ASCII85 encodes its stream when rl_config.useA85 is set,
+    which is ReportLab's default. That makes every report image a quarter
+    larger and, without ReportLab's C extension, encoding it takes longer
+    than the rest of the build, so report images skip it while the setting
+    stays as it is for everything else.
+    """
+
+    def loadImageFromJPEG(self, imageFile):
+        try:
+            width, height, components = readJPEGInfo(imageFile)[:3]
+        except Exception:
+            return False
+        finally:
+            imageFile.seek(0)
+        self.width, self.height = width, height
+        self.bitsPerComponent = 8
+        self.colorSpace = {1: 'DeviceGray', 3: 'DeviceRGB'}.get(components, 'DeviceCMYK')
+        self._dotrans = components not in (1, 3)
+        self.streamContent = imageFile.read()
+        self._filters = ('DCTDecode',)
+        self.mask = None
+        return True
+
+    def loadImageFromSRC(self, im):
+        fp = im.jpeg_fh()
+        if fp:
+            self.loadImageFromJPEG(fp)
+            return
+        self.width, self.height = im.getSize()
+        self.streamContent = zlib.compress(im.getRGBData())
+        self._filters = ('FlateDecode',)
+        self.colorSpace = {'RGB': 'DeviceRGB', 'L': 'DeviceGray', 'CMYK': 'DeviceCMYK'}[im.mode]
+        self.bitsPerComponent = 8
+        self._checkTransparency(im)
+        smask = getattr(self, '_smask', None)
+        if smask is not None and 'ASCII85Decode' in smask._filters:
+            self._smask = BinaryImageXObject(smask.name, im._dataA, mask=None)
+            self._smask._decode = [0, 1]
@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import threading
+
+
+# Reports up to this size stay in memory, larger ones are moved to a
+# temporary file. BIM_SPOOL_BYTES overrides
+SPOOL_BYTES = int(os.environ.get('BIM_SPOOL_BYTES', 32 * 1024 * 1024))
+
+
+class ReportFile(tempfile.SpooledTemporaryFile):
+    """A report PDF kept in memory up to SPOOL_BYTES and on disk beyond.
+
+    ReportLab and PyPDF2 write into it like any binary file, so a finished
+    report exists once rather than as a buffer plus the bytes copied out of
+    it. Downloads are handed reader(), a file object of their own, and
+    close() deletes the temporary file. Other generated downloads, such as
+    rebased viewpoint XML, pass their own suffix.
+    """
+
+    def __init__(self, max_size=SPOOL_BYTES, suffix='.pdf'):
+        super().__init__(max_size=max_size, prefix='bim-report-', suffix=suffix)
+        self.lock = threading.Lock()
+
+    @property
+    def size(self):
+        with self.lock:
+            return self.seek(0, os.SEEK_END)
+
+    def reader(self):
+        """A new file object reading the finished file from the start.
+
+        It has its own position, so downloads of the same report can run at
+        once and do not move the file's. Once on disk it reads straight from
+        the temporary file, which it keeps open even past close(), so
+        download_button gets the bytes in one read instead of a copy made
+        here first.
+        """
+        with self.lock:
+            if not self._rolled:
+                return io.BytesIO(self._file.getbuffer())
+            if hasattr(os, 'pread'):
+                self.flush()
+                return _FileReader(self.fileno())
+            # No pread on Windows, read it back whole
+            self.seek(0)
+            return io.BytesIO(self.read())
+
+    def close(self):
+        with self.lock:
+            super().close()
+
+
+class _FileReader(io.RawIOBase):
+    # Reads a file descriptor of its own with os.pread, never moving the
+    # position of the file it was opened from
+
+    def __init__(self, fileno):
+        super().__init__()
+        self.fd = os.dup(fileno)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += os.fstat(self.fd).st_size
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, buffer):
+        data = os.pread(self.fd, len(buffer), self.position)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def readall(self):
+        pieces = []
+        while True:
+            data = os.pread(self.fd, max(os.fstat(self.fd).st_size - self.position, 1), self.position)
+            if not data:
+                return b''.join(pieces)
+            pieces.append(data)
+            self.position += len(data)
+
+    def close(self):
+        if not self.closed:
+            os.close(self.fd)
+        super().close()
@@ -0,0 +1,90 @@
+import threading
+
+from PIL import Image as pil_image
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from bimtools.parse_cache import hold_across_fork
+
+
+FONT_FILES = {
+    'Sarabun': r'./Font/THSarabunNew.ttf',
+    'Sarabun-Bold': r'./Font/THSarabunNew Bold.ttf',
+}
+LOGO_PATH = r"./Media/1-Aurecon-logo-colour-RGB-Positive.png"
+
+
+def build_styles():
+    """The sample style sheet plus the report styles, all derived from Normal."""
+    styles = getSampleStyleSheet()
+    normal = styles['Normal']
+    # Detail labels and values in the clash report cells
+    styles.add(ParagraphStyle('Bold', parent=normal, fontName='Sarabun-Bold'))
+    styles.add(ParagraphStyle('Light', parent=normal, fontName='Sarabun'))
+    # Cells and column headings of the wide table report
+    styles.add(ParagraphStyle('Cell', parent=normal, fontName='Sarabun', alignment=TA_LEFT))
+    styles.add(ParagraphStyle(
+        'Header',
+        parent=normal,
+        fontName='Sarabun-Bold',
+        fontSize=18,
+        textColor=colors.white,
+        alignment=TA_LEFT,
+        spaceAfter=12,
+        leftIndent=6,
+        leading=16,
+    ))
+    return styles
+
+
+class ReportResources:
+    """Fonts, logo and paragraph styles shared by every report in the process.
+
+    Each is loaded on first use and then handed out as the same instance, so
+    building a report no longer re-reads the TTFs, re-opens the logo on
+    every page or creates styles for every row. The styles are shared by
+    concurrent builds and must not be modified; derive a ParagraphStyle with
+    one of them as parent instead.
+    """
+
+    def __init__(self, font_files=FONT_FILES, logo_path=LOGO_PATH):
+        self.font_files = font_files
+        self.logo_path = logo_path
+        # Shard workers are forked and use the fonts and styles
+        self.lock = hold_across_fork(threading.Lock())
+        self._logo_size = None
+        self._styles = None
+
+    def register_fonts(self):
+        registered = pdfmetrics.getRegisteredFontNames()
+        with self.lock:
+            for name, path in self.font_files.items():
+                if name not in registered:
+                    pdfmetrics.registerFont(TTFont(name, path))
+
+    @property
+    def logo_size(self):
+        """Pixel size of the logo, read once instead of on every page.
+
+        Pages still draw the logo by logo_path: ReportLab embeds an image
+        given by name once per document, whereas an ImageReader is hashed
+        again on every drawImage call.
+        """
+        with self.lock:
+            if self._logo_size is None:
+                with pil_image.open(self.logo_path) as img:
+                    self._logo_size = img.size
+            return self._logo_size
+
+    @property
+    def styles(self):
+        with self.lock:
+            if self._styles is None:
+                self._styles = build_styles()
+            return self._styles
+
+
+report_resources = ReportResources()
@@ -0,0 +1,334 @@
+"""Clash report layouts shared by the project pages.
+
+A page describes each of its reports once as a WideReport or NoteReport
+(columns, image slots, detail fields, header colours, page size) and calls
+the result like the generate_pdf* functions it replaces. Everything that
+does not depend on the rows is worked out when the layout is built, so a
+render only builds rows, and those go through the row cache.
+"""
+import hashlib
+import os
+import time
+from collections import namedtuple
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A3, A4, landscape
+from reportlab.lib.units import inch
+from reportlab.platypus import Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle
+
+from bimtools.fixed_rows import FixedRowLayout, fixed_row_blocks
+from bimtools.jobs import ProgressDocTemplate
+from bimtools.pdf_images import shared_image
+from bimtools.report_resources import report_resources
+from bimtools.row_cache import cached_rows, store_rows
+from bimtools.table_blocks import frame_height, page_bounds, table_blocks
+from bimtools.thumbnails import DEFAULT_IMAGE_QUALITY, pdf_image_sizes, prepare_pdf_images, total_image_bytes
+
+
+# An image column: table heading, DataFrame column, drawn size in points and
+# the text shown when the row has no image
+ImageSlot = namedtuple('ImageSlot', ['heading', 'column', 'size', 'missing'])
+# One "Label" / value pair in the Details column
+DetailField = namedtuple('DetailField', ['label', 'column'])
+HeaderColours = namedtuple('HeaderColours', ['background', 'text'])
+
+# NoteReport rows go through Table. BIM_DIRECT_ROWS=1 draws the rows whose
+# notes fit beside the rest of the row directly on the canvas, see fixed_rows
+DIRECT_ROWS = os.environ.get('BIM_DIRECT_ROWS', '0') == '1'
+
+
+def draw_logo(canvas, doc):
+    width, height = report_resources.logo_size
+    new_height = 0.25 * inch
+    new_width = new_height * width / height
+    canvas.drawImage(report_resources.logo_path, 0.2*inch, doc.height + 1.5*inch,
+                     width=new_width, height=new_height)
+
+
+def wide_page_header(canvas, doc, project_name, table_size):
+    draw_logo(canvas, doc)
+    canvas.setFont("Sarabun-Bold", 30)
+    canvas.drawCentredString(doc.width/2 + 0.5*inch, doc.height + 1.2*inch + 0.25*inch, project_name)
+    timestamp = time.strftime("%Y/%m/%d %H:%M:%S")
+    canvas.setFont("Sarabun-Bold", 10)
+    canvas.drawRightString(doc.width + inch, doc.height + inch + 0.75*inch, f"Generated on: {timestamp}")
+
+
+def a4_page_header(canvas, doc, project_name, table_size):
+    page_width, page_height = table_size
+    draw_logo(canvas, doc)
+    canvas.setFont("Sarabun-Bold", 26)
+    canvas.drawCentredString(page_width/2, doc.height + 1.0*inch, project_name)
+    timestamp = time.strftime("%Y/%m/%d")
+    canvas.setFont("Sarabun-Bold", 10)
+    canvas.drawRightString(page_width - 0.2*inch, page_height - 0.2*inch, f"Generated on: {timestamp}")
+
+
+def plan_page_header(canvas, doc, project_name, table_size):
+    page_width, page_height = table_size
+    draw_logo(canvas, doc)
+    canvas.setFont("Sarabun-Bold", 30)
+    canvas.drawCentredString(doc.width/2 + 0.5*inch, doc.height + 1.0*inch + 0.25*inch, project_name)
+    timestamp = time.strftime("%Y/%m/%d")
+    canvas.setFont("Sarabun-Bold", 10)
+    canvas.drawRightString(page_width - 0.2*inch, page_height - 0.2*inch, f"Generated on: {timestamp}")
+
+
+def margin_frame(page_width, page_height):
+    return Frame(0.7*inch, 0.7*inch, page_width - 2*0.7*inch, page_height - 2*0.7*inch, id='F1')
+
+
+def band_frame(page_width, page_height):
+    # Full width, 80% of the height, leaving room for the page header
+    return Frame(0, 0.1*page_height, page_width, 0.8*page_height, id='F1')
+
+
+def image_cell(value, slot, image_quality):
+    image = shared_image(value, slot.size, image_quality)
+    return slot.missing if image is None else image
+
+
+def detail_cells(row, fields, styles):
+    cells = []
+    for field in fields:
+        cells.append(Paragraph(f"{field.label}:", style=styles["Bold"]))
+        cells.append(Paragraph(f"{row[field.column]}".strip(), style=styles["Light"]))
+    cells.append(Spacer(1, 0.1*inch))
+    return cells
+
+
+def note_cells(note, styles):
+    if not note:
+        return [Spacer(1, 0.1*inch)]
+    return [Paragraph(line, style=styles["Light"]) for line in note.splitlines()]
+
+
+class ReportTemplate:
+    """Page size, frame and decorations of a report, plus the render loop.
+
+    Subclasses set up self.table_style, self.col_widths, self.images and
+    self.key in their constructor and build the header and body rows.
+    """
+
+    def __init__(self, pagesize, frame, page_header, table_size):
+        self.pagesize = pagesize
+        self.frame = frame
+        self.page_header = page_header
+        self.table_size = table_size
+
+    def make_key(self, *spec):
+        # Names the layout in the row and shard caches
+        return hashlib.sha256(repr((type(self).__name__,) + spec).encode()).hexdigest()
+
+    def build_doc(self, output, project_name):
+        doc = ProgressDocTemplate(output, pagesize=self.pagesize)
+
+        def decorate(canvas, doc):
+            self.page_header(canvas, doc, project_name, self.table_size)
+
+        frame = self.frame(*self.pagesize)
+        doc.addPageTemplates([PageTemplate('normal', [frame], onPage=decorate)])
+        return doc
+
+    def image_columns(self):
+        # Image columns grouped by the size they are drawn at
+        return {size: list({slot.column for slot in self.images if slot.size == size})
+                for size in {slot.size for slot in self.images}}
+
+    def with_images(self, df, lookup):
+        """df with the file names in its image columns swapped for the
+        uploads lookup (e.g. image_dict) has under those names.
+
+        Names lookup does not have stay as they are and print as the slot's
+        missing text; values that are already uploads are left alone.
+        """
+        def resolve(value):
+            return lookup.get(value, value) if isinstance(value, str) else value
+
+        columns = {slot.column for slot in self.images if slot.column in df.columns}
+        return df.assign(**{col: df[col].map(resolve) for col in columns})
+
+    def prepare_images(self, rows, image_quality=DEFAULT_IMAGE_QUALITY):
+        for size, columns in self.image_columns().items():
+            prepare_pdf_images(rows, columns, size, image_quality=image_quality)
+
+    def image_sizes(self, df, image_quality=DEFAULT_IMAGE_QUALITY):
+        """Total bytes of the distinct images in df as uploaded and as embedded."""
+        sizes = {}
+        for size, columns in self.image_columns().items():
+            sizes.update(pdf_image_sizes(df, columns, size, image_quality))
+        return total_image_bytes(sizes)
+
+    def __call__(self, df, project_name, start=1, image_quality=DEFAULT_IMAGE_QUALITY, output=None,
+                 images=None):
+        """Build the report for df and return the PDF bytes.
+
+        Given an output file (e.g. a ReportFile), the PDF is written there
+        instead and the file is returned. Image columns may hold file names
+        rather than uploads when images maps those names, see with_images.
+        """
+        if images is not None:
+            df = self.with_images(df, images)
+        pdf = BytesIO() if output is None else output
+        doc = self.build_doc(pdf, project_name)
+        keys, cells, heights = cached_rows(
+            f"{self.key}:{image_quality.dpi}:{image_quality.jpeg_quality}", df,
+            lambda row: self.row_cells(row, image_quality),
+            prepare=lambda rows: self.prepare_images(rows, image_quality))
+        story = self.story(cells, heights, start, frame_height(doc))
+        store_rows(keys, cells, heights)
+        doc.build(story)
+        return pdf.getvalue() if output is None else output
+
+    def page_starts(self, df, project_name, image_quality=DEFAULT_IMAGE_QUALITY):
+        """Positions in df of the rows that start a page of its report.
+
+        Rows are built and measured as for a render, and what the row cache
+        keeps of them is stored, so a render of df, or of rows of it from
+        one of these positions on, finds them measured and lays them out on
+        the same pages. render_sharded cuts its shards here.
+        """
+        block_height = frame_height(self.build_doc(BytesIO(), project_name))
+        keys, cells, heights = cached_rows(
+            f"{self.key}:{image_quality.dpi}:{image_quality.jpeg_quality}", df,
+            lambda row: self.row_cells(row, image_quality),
+            prepare=lambda rows: self.prepare_images(rows, image_quality))
+        if None in heights:
+            self.story(cells, heights, 1, block_height)
+            store_rows(keys, cells, heights)
+        header = Table([self.header_row()], colWidths=self.col_widths, style=self.table_style)
+        header.wrap(sum(self.col_widths), block_height)
+        return [start for start, _ in page_bounds(heights, header._rowHeights[0], block_height)]
+
+    def story(self, cells, heights, start, block_height):
+        data = [self.header_row()] + self.body_rows(cells, start)
+        return table_blocks(data, self.col_widths, self.table_style, block_height, row_heights=heights)
+
+
+class WideReport(ReportTemplate):
+    """One row per clash with a column per field, on landscape A3.
+
+    columns are DataFrame columns in table order; those named by an image
+    slot hold the screenshot, the rest are printed as text under their
+    column name.
+    """
+
+    def __init__(self, columns, col_widths, header,
+                 images=(ImageSlot("Image", "Image", 150, "Image not found"),),
+                 pagesize=landscape(A3)):
+        super().__init__(pagesize, margin_frame, wide_page_header, pagesize)
+        self.columns = list(columns)
+        self.col_widths = list(col_widths)
+        self.images = list(images)
+        self.slots = {slot.column: slot for slot in self.images}
+        styles = report_resources.styles
+        self.table_style = [
+            ('BACKGROUND', (0, 0), (-1, 0), header.background),
+            ('TEXTCOLOR', (0, 0), (-1, 0), header.text),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 0), (-1, -1), 'Sarabun'),
+            ('FONTSIZE', (0, 0), (-1, 0), 16),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('STYLE', (0, 0), (-1, -1), styles["Cell"]),
+        ]
+        self.key = self.make_key(self.columns, self.col_widths, header, self.images, pagesize)
+
+    def header_row(self):
+        header_style = report_resources.styles["Header"]
+        return [Paragraph(col, header_style) for col in self.columns]
+
+    def row_cells(self, row, image_quality):
+        cell_style = report_resources.styles["Cell"]
+        return [image_cell(row[col], self.slots[col], image_quality) if col in self.slots
+                else Paragraph(str(row[col]), cell_style)
+                for col in self.columns]
+
+    def body_rows(self, cells, start):
+        return cells
+
+
+class NoteReport(ReportTemplate):
+    """Numbered clash cards: No., screenshots, Details and Note columns.
+
+    col_widths are fractions of the table_size width, one per column. The
+    plan reports lay their table out against portrait A3 on a landscape A3
+    page, which is what table_size is for. notes=None drops the Note column.
+
+    With direct, rows whose notes fit beside their images and details skip
+    Table and are drawn by fixed_rows; the row cache then keeps their
+    layout. Table is used when ReportLab is not one fixed_rows supports.
+    """
+
+    def __init__(self, images, details, col_widths, header, notes='Notes',
+                 pagesize=A4, table_size=None, page_header=a4_page_header, direct=DIRECT_ROWS):
+        table_size = table_size or pagesize
+        super().__init__(pagesize, band_frame, page_header, table_size)
+        self.images = list(images)
+        self.details = list(details)
+        self.notes = notes
+        self.col_widths = [fraction * table_size[0] for fraction in col_widths]
+        self.headings = (["No."] + [slot.heading for slot in self.images] + ["Details"]
+                         + (["Note"] if notes else []))
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), header.background),
+            ('TEXTCOLOR', (0, 0), (-1, 0), header.text),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Sarabun-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 18),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), '#ffffff'),
+            ('GRID', (0, 0), (-1, -1), 1, '#2B2B2B'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Sarabun'),
+            ('FONTSIZE', (1, 1), (1, -1), 16),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (0, 0), 'Sarabun-Bold'),
+            ('FONTSIZE', (0, 0), (0, -1), 16)
+        ])
+        self.layout = (FixedRowLayout(self.headings, self.col_widths, self.table_style,
+                                      notes=len(self.headings) - 1 if notes else None)
+                       if direct else None)
+        if self.layout is not None and not self.layout.supported:
+            self.layout = None
+        self.key = self.make_key(self.images, self.details, self.col_widths, header, notes,
+                                 pagesize, table_size, page_header.__name__, self.layout is not None)
+
+    def header_row(self):
+        return list(self.headings)
+
+    def row_cells(self, row, image_quality):
+        styles = report_resources.styles
+        cells = [image_cell(row[slot.column], slot, image_quality) for slot in self.images]
+        cells.append(detail_cells(row, self.details, styles))
+        if self.notes:
+            cells.append(note_cells(row[self.notes], styles))
+        return cells
+
+    def body_rows(self, cells, start):
+        # The running number stays out of the cached cells, it moves whenever
+        # rows before it are added or filtered out
+        return [[str(idx)] + row_cells for idx, row_cells in enumerate(cells, start)]
+
+    def story(self, cells, heights, start, block_height):
+        if self.layout is None:
+            return super().story(cells, heights, start, block_height)
+        # New rows whose notes fit are laid out once and replace their
+        # cells, so the row cache keeps the layout
+        max_height = block_height - self.layout.header_height
+        for pos, row_cells in enumerate(cells):
+            if heights[pos] is None:
+                row = self.layout.row(row_cells, max_height)
+                if row is not None:
+                    cells[pos], heights[pos] = row, row.height
+        return fixed_row_blocks(self.header_row(), cells, heights, start, self.layout,
+                                self.table_style, block_height)
+
+
+def plan_report(images, details, col_widths, header, **kwargs):
+    """NoteReport laid out like the landscape A3 "With Plan" reports."""
+    return NoteReport(images, details, col_widths, header, pagesize=landscape(A3),
+                      table_size=A3, page_header=plan_page_header, **kwargs)
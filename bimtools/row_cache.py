@@ -0,0 +1,83 @@
+import hashlib
+import sys
+
+from bimtools.fixed_rows import FixedRow
+from bimtools.parse_cache import ParseCache
+from bimtools.thumbnails import image_digest
+
+
+MAX_ROW_BYTES = 256 * 1024 * 1024
+MAX_ROW_ENTRIES = 20000
+MAX_FRAGMENT_BYTES = 512 * 1024 * 1024
+MAX_FRAGMENT_ENTRIES = 512
+
+
+def row_entry_size(entry):
+    # A FixedRow counts with the text and image data it holds
+    layout, height = entry
+    return (sys.getsizeof(entry) + sys.getsizeof(height)
+            + (0 if layout is None else layout.payload_size()))
+
+
+# Measured height per report row, with its FixedRow when it has one
+row_cache = ParseCache(max_bytes=MAX_ROW_BYTES, max_entries=MAX_ROW_ENTRIES, size=row_entry_size)
+# Rendered PDF of each shard of a sharded report, see render_sharded
+fragment_cache = ParseCache(max_bytes=MAX_FRAGMENT_BYTES, max_entries=MAX_FRAGMENT_ENTRIES)
+
+
+def row_key(template, row):
+    """SHA-256 of a report template name and everything shown for one row.
+
+    Images are hashed by their bytes, so the same screenshot uploaded again
+    gives the same key.
+    """
+    sha = hashlib.sha256(template.encode())
+    for col, value in row.items():
+        if hasattr(value, 'getvalue'):
+            value = image_digest(value)
+        sha.update(f"\x1f{col}\x1e{value}".encode())
+    return sha.hexdigest()
+
+
+def row_keys(template, df):
+    return [row_key(template, row) for _, row in df.iterrows()]
+
+
+def cached_rows(template, df, build, prepare=None):
+    """Table cells for every row of df, plus the measured height of rows seen before.
+
+    build(row) returns the body cells of one row, without the running
+    number, which changes whenever rows before it are added or filtered
+    out. prepare(rows) is called once with just the rows whose cells are
+    built (e.g. to render their images in bulk).
+
+    The cache is shared by every build in the process, including
+    concurrent report jobs, so it only keeps what those can share: each
+    row's height and, for rows laid out by fixed_rows, the FixedRow, which
+    is never changed once made. Paragraphs, tables and images keep their
+    canvas and line breaks while they are wrapped and drawn, so rows drawn
+    through Table get fresh cells from build for every report; their cached
+    height still saves measuring them.
+
+    Returns (keys, cells, heights), where cells holds a FixedRow or the
+    built cells of each row and heights is None for rows not seen before;
+    pass heights to table_blocks as row_heights and then everything to
+    store_rows.
+    """
+    keys = row_keys(template, df)
+    cached = [row_cache.get(key) for key in keys]
+    cells = [None if entry is None else entry[0] for entry in cached]
+    heights = [None if entry is None else entry[1] for entry in cached]
+    missing = [pos for pos, row_cells in enumerate(cells) if row_cells is None]
+    if missing and prepare is not None:
+        prepare(df.iloc[missing])
+    for pos in missing:
+        cells[pos] = build(df.iloc[pos])
+    return keys, cells, heights
+
+
+def store_rows(keys, cells, heights):
+    for key, row_cells, height in zip(keys, cells, heights):
+        if height is not None:
+            row_cache.put(key, (row_cells if isinstance(row_cells, FixedRow) else None, height))
+
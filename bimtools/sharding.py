@@ -0,0 +1,169 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from bimtools import thumbnails
+from bimtools.jobs import current_job
+from bimtools.pdf_combine import combine_pdfs
+from bimtools.row_cache import fragment_cache, row_keys
+
+
+# Rows per shard, rounded up to a page boundary for report templates;
+# reports at or below this size render in one piece
+SHARD_ROWS = int(os.environ.get('BIM_SHARD_ROWS', 250))
+
+# The job a forked worker renders shards of, set by _start_worker in the
+# worker only; the server process never sets it
+_worker_job = None
+
+
+def render_sharded(render, df, project_name, rows_per_shard=SHARD_ROWS, workers=None,
+                   reuse_shards=True, image_quality=None, output=None):
+    """Build a report as row shards in worker processes and stitch them.
+
+    render is one of the pages' generate_pdf* functions and is called as
+    render(chunk, project_name, start=n), where n is the running number of
+    the chunk's first row, so the No. column carries on across shards. Each
+    shard repeats the table header and page decorations like any page of a
+    single build. Report templates are cut where a page starts (see
+    page_starts), at least rows_per_shard rows apart, so the stitched
+    report has the pages of a single build; rows are measured here for
+    that, and the workers find them in the row cache. Small reports, one
+    worker or platforms without fork fall back to a single render call.
+
+    Rendered shards are cached by the hash of their rows, so regenerating
+    after a few edits only renders the shards those edits fall in. Reports
+    stamped with more than the date pass reuse_shards=False, which neither
+    reads nor stores them.
+
+    Returns the PDF bytes, or with an output file (e.g. a ReportFile)
+    writes the PDF there and returns the file; render must then accept
+    output too, as report templates do.
+
+    image_quality, when given, is passed on to render. Report templates
+    then render the images of all missing shards here before forking, so
+    the shards share them and they are at hand for image_sizes().
+
+    When run from the report job queue, rows and pages are reported to the
+    job as each shard finishes, and a cancelled job stops handing out shards.
+
+    Workers are forked with the job as the pool's initargs, so only shard
+    bounds are pickled; report functions defined in a page script and
+    BytesIO images are not. Concurrent builds each fork their own pool.
+    The server is multi-threaded and a forked child only has the forking
+    thread, so a lock another thread held at that moment would stay taken
+    in the child. The caches and resources workers use are held across the
+    fork for that reason (see hold_across_fork); a new lock taken in a
+    worker must be too. BIM_SHARD_ROWS past the report size, or workers=1,
+    renders without forking.
+    """
+    options = {} if image_quality is None else {'image_quality': image_quality}
+    workers = workers or thumbnails.IMAGE_WORKERS
+    shards = []
+    if len(df) > rows_per_shard and workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        shards = _shard_bounds(render, df, project_name, rows_per_shard, options)
+    if len(shards) < 2:
+        if output is not None:
+            return render(df, project_name, output=output, **options)
+        return render(df, project_name, **options)
+
+    keys = row_keys(f"{render_key(render)}:{image_quality}", df)
+    shard_keys = {shard: _shard_key(keys[shard[0]:shard[1]], shard[0], project_name) for shard in shards}
+    parts = {shard: fragment_cache.get(shard_keys[shard]) if reuse_shards else None
+             for shard in shards}
+    missing = [shard for shard in shards if parts[shard] is None]
+    for start, end in shards:
+        if parts[start, end] is not None:
+            _report_shard(None, end - start, parts[start, end])
+
+    if len(missing) > 1 and hasattr(render, 'prepare_images'):
+        rows = [pos for start, end in missing for pos in range(start, end)]
+        render.prepare_images(df.iloc[rows], **options)
+
+    job = (render, df, project_name, options)
+    if len(missing) == 1:
+        # A single edited shard renders here, which also fills the row
+        # cache; its doc template reports progress itself
+        parts[missing[0]] = _render_shard(job, missing[0])
+    elif missing:
+        with ProcessPoolExecutor(max_workers=min(workers, len(missing)),
+                                 mp_context=multiprocessing.get_context('fork'),
+                                 initializer=_start_worker, initargs=(job,)) as pool:
+            for (start, end), part in zip(missing, pool.map(_render_forked_shard, missing)):
+                parts[start, end] = part
+                _report_shard(pool, end - start, part)
+
+    if reuse_shards:
+        for shard in missing:
+            fragment_cache.put(shard_keys[shard], parts[shard])
+    combined = combine_pdfs([BytesIO(parts[shard]) for shard in shards], share_images=True, output=output)
+    return combined.getvalue() if output is None else combined
+
+
+def _shard_bounds(render, df, project_name, rows_per_shard, options):
+    # (start, end) rows of each shard. Report templates cut shards where a
+    # page starts, so the pages of the shards are those of a single build;
+    # other renderers every rows_per_shard rows
+    if hasattr(render, 'page_starts'):
+        page_starts = render.page_starts(df, project_name, **options)
+    else:
+        page_starts = range(len(df))
+    starts = [0]
+    for start in page_starts:
+        if start - starts[-1] >= rows_per_shard:
+            starts.append(start)
+    return list(zip(starts, starts[1:] + [len(df)]))
+
+
+def render_key(render):
+    # Report templates name themselves, plain functions by where they live
+    key = getattr(render, 'key', None)
+    if key is None:
+        key = f"{render.__code__.co_filename}:{render.__qualname__}"
+    return key
+
+
+def _shard_key(keys, start, project_name):
+    # The page header carries the project name and today's date
+    sha = hashlib.sha256(f"{project_name}\x1f{time.strftime('%Y%m%d')}\x1f{start}".encode())
+    for key in keys:
+        sha.update(key.encode())
+    return sha.hexdigest()
+
+
+def _report_shard(pool, rows, part):
+    job = current_job()
+    if job is None:
+        return
+    job.rows_done = min(job.rows_total, job.rows_done + rows)
+    job.pages_done += len(PdfReader(BytesIO(part)).pages)
+    if job.cancel_event.is_set():
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        job.check_cancelled()
+
+
+def _start_worker(job):
+    # Runs once in each forked worker, which inherits job rather than
+    # unpickling it. Shards already run in parallel, don't nest an image
+    # pool inside them
+    global _worker_job
+    _worker_job = job
+    thumbnails.IMAGE_WORKERS = 1
+
+
+def _render_forked_shard(shard):
+    return _render_shard(_worker_job, shard)
+
+
+def _render_shard(job, shard):
+    render, df, project_name, options = job
+    start, end = shard
+    part = render(df.iloc[start:end], project_name, start=start + 1, **options)
+    # Some renderers return a BytesIO rather than bytes
+    return part.getvalue() if hasattr(part, 'getvalue') else part
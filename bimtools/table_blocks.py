@@ -0,0 +1,64 @@
+from reportlab.platypus import PageBreak, Table
+
+
+def frame_height(doc):
+    """Usable height of the first frame of a doc template, inside its padding."""
+    return doc.pageTemplates[0].frames[0]._aH
+
+
+def table_blocks(data, col_widths, style, block_height, repeat_rows=1, row_heights=None):
+    """Lay out a header + rows table as page sized Tables for a story.
+
+    A single Table with repeatRows re-measures and re-splits everything left
+    on each page break, so layout time grows with the square of the row
+    count. Here every row is measured once in one pass, then rows are packed
+    greedily into blocks no taller than block_height, each starting with the
+    header rows. A row taller than a page gets a block of its own and is
+    split by ReportLab as before.
+
+    row_heights, when given, holds a known height or None for each body row;
+    only the rows without one are measured and their heights are filled in.
+    """
+    if row_heights is None:
+        row_heights = [None] * (len(data) - repeat_rows)
+    unknown = [i for i, height in enumerate(row_heights) if height is None]
+    measured = Table(data[:repeat_rows] + [data[repeat_rows + i] for i in unknown],
+                     colWidths=col_widths, repeatRows=repeat_rows, style=style)
+    measured.wrap(sum(col_widths), block_height)
+    for i, height in zip(unknown, measured._rowHeights[repeat_rows:]):
+        row_heights[i] = height
+    heights = measured._rowHeights[:repeat_rows] + row_heights
+
+    header = data[:repeat_rows]
+    bounds = [(start + repeat_rows, end + repeat_rows)
+              for start, end in page_bounds(row_heights, sum(heights[:repeat_rows]), block_height)]
+
+    # Row heights are already known, so the blocks skip measuring again, and
+    # a page break between full blocks saves ReportLab a failed split attempt
+    # at the bottom of every page
+    story = []
+    for start, end in bounds:
+        if story:
+            story.append(PageBreak())
+        story.append(Table(header + data[start:end], colWidths=col_widths,
+                           rowHeights=heights[:repeat_rows] + heights[start:end],
+                           repeatRows=repeat_rows, style=style))
+    return story
+
+
+def page_bounds(row_heights, header_height, block_height):
+    """(start, end) of the body rows on each page of a table.
+
+    Rows are packed greedily under a header header_height tall into pages
+    no taller than block_height; a row taller than a page gets a page of
+    its own.
+    """
+    bounds = []
+    start, used = 0, header_height
+    for pos, height in enumerate(row_heights):
+        if pos > start and used + height > block_height:
+            bounds.append((start, pos))
+            start, used = pos, header_height
+        used += height
+    bounds.append((start, len(row_heights)))
+    return bounds
@@ -0,0 +1,213 @@
+import hashlib
+import math
+import os
+import weakref
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from bimtools.parse_cache import ParseCache
+
+
+# Longest side in pixels of each derived variant, smallest first. "full" is
+# the uploaded file itself.
+VARIANT_SIZES = [('preview', 480), ('full', None)]
+PDF_DPI = 200
+JPEG_QUALITY = 85
+MAX_VARIANT_BYTES = 512 * 1024 * 1024
+MAX_VARIANT_ENTRIES = 4096
+# Worker processes used to prepare report images, BIM_IMAGE_WORKERS overrides
+IMAGE_WORKERS = int(os.environ.get('BIM_IMAGE_WORKERS', 0)) or os.cpu_count()
+# Below this many images a pool costs more than it saves
+MIN_PARALLEL_IMAGES = 8
+
+# Resolution report images are downsampled to and the JPEG quality they are
+# re-encoded at
+ImageQuality = namedtuple('ImageQuality', ['dpi', 'jpeg_quality'])
+DEFAULT_IMAGE_QUALITY = ImageQuality(PDF_DPI, JPEG_QUALITY)
+
+variant_cache = ParseCache(max_bytes=MAX_VARIANT_BYTES, max_entries=MAX_VARIANT_ENTRIES)
+# Streams from the ImageStore are reused across rows and reruns, so their
+# digest is remembered rather than re-hashed for every lookup
+_digests = weakref.WeakKeyDictionary()
+
+
+def image_bytes(image):
+    if hasattr(image, 'getbuffer'):
+        return image.getbuffer()
+    return image.getvalue()
+
+
+def image_digest(image):
+    try:
+        return _digests[image]
+    except (KeyError, TypeError):
+        pass
+    digest = hashlib.sha256(image_bytes(image)).hexdigest()
+    try:
+        _digests[image] = digest
+    except TypeError:
+        pass
+    return digest
+
+
+def render_variant(data, size, quality=JPEG_QUALITY):
+    """Downsample to `size` pixels on the longest side and re-encode.
+
+    Images with transparency or a palette become PNG, everything else JPEG
+    at `quality`. An image that is already small enough is only replaced
+    when re-encoding makes it smaller.
+    """
+    with Image.open(BytesIO(data)) as img:
+        keep_mode = img.mode in ('RGBA', 'LA', 'P')
+        downsampled = max(img.size) > size
+        if not downsampled and keep_mode:
+            return bytes(data)
+        img.thumbnail((size, size), Image.LANCZOS)
+        output = BytesIO()
+        if keep_mode:
+            img.save(output, format='PNG', optimize=True)
+        else:
+            img.convert('RGB').save(output, format='JPEG', quality=quality, optimize=True)
+    encoded = output.getvalue()
+    if not downsampled and len(encoded) >= len(data):
+        return bytes(data)
+    return encoded
+
+
+def image_variant(image, variant):
+    """Return a fresh BytesIO of the named variant of an uploaded image.
+
+    Variants are keyed by the SHA-256 of the original bytes and kept in an
+    LRU bounded by total size. Anything that is not a readable image
+    (e.g. the "Image not found" placeholder) is returned unchanged.
+    """
+    if not hasattr(image, 'getvalue'):
+        return image
+    size = dict(VARIANT_SIZES)[variant]
+    if size is None:
+        return BytesIO(image_bytes(image))
+    data = _cached_variant(image, (image_digest(image), variant), size, JPEG_QUALITY)
+    if data is None:
+        return image
+    return BytesIO(data)
+
+
+def _cached_variant(image, key, size, quality):
+    try:
+        return variant_cache.get_or_create(
+            key, lambda: render_variant(image_bytes(image), size, quality))
+    except OSError:
+        return None
+
+
+def preview_image(image):
+    return image_variant(image, 'preview')
+
+
+def pdf_pixels(points, image_quality=DEFAULT_IMAGE_QUALITY):
+    """Longest side in pixels that gives image_quality.dpi when drawn `points` wide."""
+    return math.ceil(points / 72 * image_quality.dpi)
+
+
+def pdf_variant(image, points, image_quality=DEFAULT_IMAGE_QUALITY):
+    """Name and bytes of an image as embedded at `points` wide in a report.
+
+    The image is downsampled to image_quality.dpi and re-encoded at its
+    JPEG quality. The name is the digest of the upload plus those settings,
+    so the same picture embedded the same way always gets the same name.
+    Returns None for anything that is not a readable image.
+    """
+    if not hasattr(image, 'getvalue'):
+        return None
+    pixels = pdf_pixels(points, image_quality)
+    key = _pdf_key(image, pixels, image_quality)
+    data = _cached_variant(image, key, pixels, image_quality.jpeg_quality)
+    if data is None:
+        return None
+    return f"{key[0]}-{pixels}-{image_quality.jpeg_quality}", data
+
+
+def pdf_image_sizes(frame, columns, points, image_quality=DEFAULT_IMAGE_QUALITY, lookup=None):
+    """Uploaded and embedded bytes of each distinct image in columns, by name.
+
+    Names are those of pdf_variant, so images repeated across rows or
+    columns are counted once, as they are embedded once.
+    """
+    sizes = {}
+    for image in _column_images(frame, columns, lookup):
+        variant = pdf_variant(image, points, image_quality)
+        if variant is not None:
+            name, data = variant
+            sizes[name] = (len(image_bytes(image)), len(data))
+    return sizes
+
+
+def total_image_bytes(sizes):
+    """(uploaded, embedded) totals of a pdf_image_sizes() result."""
+    return sum(before for before, _ in sizes.values()), sum(after for _, after in sizes.values())
+
+
+def prepare_pdf_images(frame, columns, points, lookup=None, workers=None,
+                       image_quality=DEFAULT_IMAGE_QUALITY):
+    """Render the PDF variants for every image in columns before layout.
+
+    Decoding, downsampling and re-encoding run in a process pool, and the
+    results go into the variant cache, so pdf_variant() calls made while
+    building the report are cache hits. Names are resolved through lookup
+    (e.g. image_dict) when the column holds file names instead of streams.
+    """
+    workers = workers or IMAGE_WORKERS
+    pixels = pdf_pixels(points, image_quality)
+    quality = image_quality.jpeg_quality
+
+    pending = {}
+    for image in _column_images(frame, columns, lookup):
+        key = _pdf_key(image, pixels, image_quality)
+        if key not in pending and variant_cache.get(key) is None:
+            pending[key] = image
+    if not pending:
+        return
+
+    keys = list(pending)
+    if not workers or workers < 2 or len(keys) < MIN_PARALLEL_IMAGES:
+        for key in keys:
+            _store_variant(key, _render_or_none(bytes(image_bytes(pending[key])), pixels, quality))
+        return
+
+    # Sources are copied to the workers a batch at a time so a large report
+    # never holds a second copy of every screenshot
+    batch = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(keys), batch):
+            chunk = keys[start:start + batch]
+            sources = [bytes(image_bytes(pending[key])) for key in chunk]
+            results = pool.map(_render_or_none, sources, [pixels] * len(chunk), [quality] * len(chunk))
+            for key, data in zip(chunk, results):
+                _store_variant(key, data)
+
+
+def _pdf_key(image, pixels, image_quality):
+    return (image_digest(image), 'pdf', pixels, image_quality.jpeg_quality)
+
+
+def _column_images(frame, columns, lookup):
+    for image in frame[[col for col in columns if col in frame.columns]].to_numpy().ravel():
+        if isinstance(image, str) and lookup is not None:
+            image = lookup.get(image)
+        if hasattr(image, 'getvalue'):
+            yield image
+
+
+def _store_variant(key, data):
+    if data is not None:
+        variant_cache.put(key, data)
+
+
+def _render_or_none(data, size, quality=JPEG_QUALITY):
+    try:
+        return render_variant(data, size, quality)
+    except OSError:
+        return None
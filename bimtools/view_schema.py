@@ -0,0 +1,60 @@
+import re
+
+import pandas as pd
+
+
+class ViewNameSchema:
+    """Field layout of an underscore separated Naviswork view name.
+
+    A schema compiles once into a single regular expression, so splitting,
+    the minimum-part filter and the exclude filter all happen in one
+    vectorized str.extract pass over the View Name column. Parts past the
+    declared fields are ignored and missing trailing parts come back as NaN,
+    like positional assignment from str.split(expand=True).
+    """
+
+    def __init__(self, fields, min_parts=4, exclude='*', separator='_'):
+        self.fields = list(fields)
+        self.min_parts = min_parts
+        self.exclude = exclude
+        self.separator = separator
+        self.pattern = re.compile(self._build_pattern())
+
+    def _build_pattern(self):
+        sep = re.escape(self.separator)
+        part = f'[^{sep}]*'
+        total = max(len(self.fields), self.min_parts)
+
+        # Required parts are chained, optional ones nest so that a missing
+        # part leaves every later field empty.
+        pattern = ''
+        for i in reversed(range(total)):
+            value = f'(?P<f{i}>{part})' if i < len(self.fields) else part
+            if i == 0:
+                pattern = value + pattern
+            elif i < self.min_parts:
+                pattern = sep + value + pattern
+            else:
+                pattern = f'(?:{sep}{value}{pattern})?'
+
+        guard = f'(?!.*{re.escape(self.exclude)})' if self.exclude else ''
+        return '^' + guard + pattern
+
+    def decompose(self, view_names):
+        """Split view names into fields.
+
+        Returns (fields, stats): fields holds only the accepted rows, indexed
+        like view_names; stats counts per field how many rows had a value and
+        how many were rejected or left it empty.
+        """
+        extracted = view_names.str.extract(self.pattern)
+        extracted.columns = self.fields
+        accepted = extracted[self.fields[0]].notna()
+        fields = extracted[accepted]
+
+        matched = fields.notna().sum()
+        stats = pd.DataFrame({
+            'Matched': matched,
+            'Rejected': len(view_names) - matched,
+        }).rename_axis('Field')
+        return fields, stats
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from bimtools import thumbnails
+from bimtools.parse_cache import cached_parse
+from bimtools.viewpoint_transform import rewrite_viewpoints
+from bimtools.xml_ingest import VIEWPOINT_PROFILE, read_viewpoints
+
+
+# One row per XML in the batch; Error is None for files that were rebased
+SUMMARY_COLUMNS = ['File', 'Views', 'Seconds', 'Error']
+
+
+def xml_members(uploaded_zip):
+    """Names of the viewpoint XMLs in a ZIP, in archive order."""
+    with zipfile.ZipFile(uploaded_zip) as archive:
+        return [info.filename for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith('.xml')
+                and not info.filename.startswith('__MACOSX/')]
+
+
+def member_viewpoints(uploaded_zip, member):
+    """read_viewpoints() of one XML in a ZIP, cached like viewpoint_table()."""
+    def read(uploaded):
+        with zipfile.ZipFile(uploaded) as archive, archive.open(member) as source:
+            return read_viewpoints(source)
+    return cached_parse((VIEWPOINT_PROFILE, member), (uploaded_zip,), read)
+
+
+def rebase_zip(uploaded_zip, transform, output, workers=None):
+    """Rebase every viewpoint XML in a ZIP and write them to a new ZIP.
+
+    Each XML is streamed through rewrite_viewpoints in a worker process,
+    which reads it from a copy of the upload on disk and writes the result
+    to a temporary file, so neither side holds a whole XML in memory.
+    Members that are not well-formed XML, or that cannot be read from the
+    ZIP (corrupt, encrypted, unsupported compression), are reported in the
+    Error column and left out of the output; the rest of the batch goes on.
+    Returns the summary as a DataFrame with SUMMARY_COLUMNS.
+    """
+    workers = workers or thumbnails.IMAGE_WORKERS
+    members = xml_members(uploaded_zip)
+    with tempfile.TemporaryDirectory(prefix='bim-rebase-') as folder:
+        archive_path = os.path.join(folder, 'upload.zip')
+        uploaded_zip.seek(0)
+        with open(archive_path, 'wb') as archive:
+            shutil.copyfileobj(uploaded_zip, archive)
+        uploaded_zip.seek(0)
+
+        jobs = [(archive_path, member, os.path.join(folder, f"{index}.xml"), transform)
+                for index, member in enumerate(members)]
+        if workers < 2 or len(jobs) < 2:
+            results = [_rebase_member(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                results = list(pool.map(_rebase_member, *zip(*jobs)))
+
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as rebased:
+            for (_, member, path, _), (_, error, _) in zip(jobs, results):
+                if error is None:
+                    rebased.write(path, member)
+
+    summary = pd.DataFrame([(member, views, seconds, error)
+                            for member, (views, error, seconds) in zip(members, results)],
+                           columns=SUMMARY_COLUMNS)
+    summary['Views'] = summary['Views'].astype('Int64')
+    return summary
+
+
+def _rebase_member(archive_path, member, output_path, transform):
+    # Returns (views, error, seconds)
+    start = time.perf_counter()
+    try:
+        with zipfile.ZipFile(archive_path) as archive, archive.open(member) as source:
+            with open(output_path, 'wb') as output:
+                views = rewrite_viewpoints(source, transform, output)
+    except ValueError as error:
+        return None, str(error), time.perf_counter() - start
+    except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError) as error:
+        # Corrupt, truncated, unsupported or encrypted member
+        return None, f"Cannot read from ZIP: {error}", time.perf_counter() - start
+    return views, None, time.perf_counter() - start
@@ -0,0 +1,232 @@
+import math
+import re
+from collections import namedtuple
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+from lxml import etree
+
+from bimtools.html_ingest import CHUNK_SIZE, iter_chunks
+
+
+# Model units a rebase can convert between, as metres per unit
+UNIT_METRES = {'m': 1.0, 'mm': 0.001}
+
+# An affine rebase of viewpoint coordinates: points are scaled about the
+# origin, turned `rotation` degrees anticlockwise about Z and moved by
+# offset (x, y, z), in that order. Camera orientations only turn.
+RebaseTransform = namedtuple('RebaseTransform', ['offset', 'rotation', 'scale'])
+
+# Markup the streaming rewrite looks at. Comments and CDATA are matched
+# whole so tags inside them are skipped. pos3f and quaternion written the
+# way Navisworks writes them match with their values as named groups,
+# other view, pos3f and quaternion tags match as a whole, and `cut` is any
+# of these running past the end of the bytes read so far.
+_MARKUP = re.compile(
+    rb'<(?:!--.*?-->|!\[CDATA\[.*?\]\]>'
+    rb'|pos3f\s+x\s*=\s*"(?P<x>[^"]*)"\s+y\s*=\s*"(?P<y>[^"]*)"\s+z\s*=\s*"(?P<z>[^"]*)"\s*/?>'
+    rb'|quaternion\s+a\s*=\s*"(?P<a>[^"]*)"\s+b\s*=\s*"(?P<b>[^"]*)"'
+    rb'\s+c\s*=\s*"(?P<c>[^"]*)"\s+d\s*=\s*"(?P<d>[^"]*)"\s*/?>'
+    rb'|(?P<closing>/?)(?P<tag>view|pos3f|quaternion)'
+    rb'(?P<attributes>(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*(?P<empty>/?)>'
+    rb'|(?P<cut>!--|!\[CDATA\[|/?(?:view|pos3f|quaternion)(?![\w.:-])))',
+    re.S)
+_ATTRIBUTE = re.compile(rb'\s+([^\s=/>]+)\s*=\s*(["\'])(.*?)\2', re.S)
+_POINT_KEYS = (b'x', b'y', b'z')
+_QUATERNION_KEYS = (b'a', b'b', b'c', b'd')
+# The value spans of a pos3f or quaternion _MARKUP matched with its values
+_POINT_SPANS = itemgetter(*(_MARKUP.groupindex[key] for key in 'xyz'))
+_QUATERNION_SPANS = itemgetter(*(_MARKUP.groupindex[key] for key in 'abcd'))
+
+
+def unit_scale(from_unit, to_unit):
+    """Scale factor that converts coordinates in from_unit to to_unit."""
+    return UNIT_METRES[from_unit] / UNIT_METRES[to_unit]
+
+
+def transform_from_pair(old, new, rotation=0.0, scale=1.0):
+    """The rebase that turns and scales like given and moves old onto new.
+
+    old and new are the (x, y, z) of the same reference viewpoint before
+    and after the survey change, both as read from the export, so in the
+    units it is exported in. The offset is fitted in the units scale
+    converts to, so the rebased old lands on new in those units; without
+    rotation or scale it is simply new - old.
+    """
+    moved = transform_points(np.array([old], dtype=float), RebaseTransform((0.0, 0.0, 0.0), rotation, scale))[0]
+    offset = np.asarray(new, dtype=float) * scale - moved
+    return RebaseTransform(tuple(offset.tolist()), rotation, scale)
+
+
+def _matrix(transform):
+    angle = math.radians(transform.rotation)
+    cos, sin = math.cos(angle), math.sin(angle)
+    return transform.scale * np.array([[cos, -sin, 0.0], [sin, cos, 0.0], [0.0, 0.0, 1.0]])
+
+
+def transform_points(points, transform):
+    """Apply a RebaseTransform to an (n, 3) array of points, in one operation."""
+    return points @ _matrix(transform).T + np.asarray(transform.offset, dtype=float)
+
+
+def transform_rotations(quaternions, transform):
+    """Turn (n, 4) camera quaternions (a, b, c, d) = (x, y, z, w) about Z."""
+    half = math.radians(transform.rotation) / 2
+    cos, sin = math.cos(half), math.sin(half)
+    x, y, z, w = quaternions.T
+    return np.column_stack((cos * x - sin * y, cos * y + sin * x, cos * z + sin * w, cos * w - sin * z))
+
+
+def format_numbers(values):
+    """Attribute text of each value, row by row, written as str(float) would.
+
+    The texts come ", " apart in one bytes string, made by a single repr of
+    the list of values rather than a str() call per value.
+    """
+    return repr(values.ravel().tolist())[1:-1].encode('ascii')
+
+
+class _WellFormed:
+    # Parser target that builds nothing; lxml still checks the syntax
+
+    def close(self):
+        pass
+
+
+def rewrite_viewpoints(source, transform, output, chunk_size=CHUNK_SIZE):
+    """Stream a viewpoint export into output with every view rebased.
+
+    The export is read a chunk at a time as UTF-8 bytes. Within views the
+    x/y/z of each pos3f and, when there is a rotation, the a/b/c/d of each
+    quaternion are replaced, a chunk's worth at a time through
+    transform_points and transform_rotations; every other byte is copied
+    through as it is. No tree is built, so memory stays at a few chunks
+    whatever the size of the export. Returns the number of views.
+
+    The same chunks are fed to lxml, so an export that is not well-formed
+    XML raises ValueError, by the end at the latest, even though the
+    rewrite itself only looks at a few tags.
+    """
+    parser = etree.XMLParser(target=_WellFormed(), resolve_entities=False)
+    views = depth = 0
+    pending = b''
+    for chunk in chain(iter_chunks(source, chunk_size), [b'']):
+        try:
+            if chunk:
+                parser.feed(chunk)
+            else:
+                parser.close()
+        except etree.XMLSyntaxError as error:
+            raise ValueError(f"Not well-formed XML: {error}") from error
+        buffer = pending + chunk
+        pending = b''
+        points, quaternions = [], []
+        scanned = 0
+        for match in _MARKUP.finditer(buffer):
+            kind = match.lastgroup
+            if kind == 'cut':
+                if not chunk:
+                    raise ValueError("Viewpoint XML ends inside a tag, comment or CDATA section")
+                pending = buffer[match.start():]
+                break
+            scanned = match.end()
+            if kind == 'z':
+                if depth:
+                    points.append(_POINT_SPANS(match.regs))
+            elif kind == 'd':
+                if depth and transform.rotation:
+                    quaternions.append(_QUATERNION_SPANS(match.regs))
+            elif kind == 'empty':
+                closing, tag, empty = match.group('closing', 'tag', 'empty')
+                if tag == b'view':
+                    if closing:
+                        depth -= 1
+                    elif not empty:
+                        depth += 1
+                    views += not closing
+                elif depth and not closing:
+                    if tag == b'pos3f':
+                        points.append(_value_spans(buffer, match, _POINT_KEYS))
+                    elif transform.rotation:
+                        quaternions.append(_value_spans(buffer, match, _QUATERNION_KEYS))
+        else:
+            # Keep a tag cut off at the end for the next chunk
+            cut = buffer.rfind(b'<', scanned) if chunk else -1
+            if cut >= 0:
+                pending = buffer[cut:]
+
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        edits = [_edits(data, points, lambda values: transform_points(values, transform)),
+                 _edits(data, quaternions, lambda values: transform_rotations(values, transform))]
+        output.write(_splice(data, [edit for edit in edits if edit is not None], len(buffer) - len(pending)))
+    return views
+
+
+def _value_spans(buffer, tag, keys):
+    spans = {match[1]: match.span(3) for match in _ATTRIBUTE.finditer(buffer, *tag.span('attributes'))}
+    missing = [key.decode() for key in keys if key not in spans]
+    if missing:
+        raise ValueError(f"{tag['tag'].decode()} without {', '.join(missing)}")
+    return [spans[key] for key in keys]
+
+
+def _edits(data, tags, apply):
+    # (starts, ends, text, text starts, text ends) of the values in tags:
+    # where each is in data and where its new text is in text
+    if not tags:
+        return None
+    count = sum(map(len, tags))
+    spans = np.fromiter(chain.from_iterable(chain.from_iterable(tags)), dtype=np.int64, count=2 * count)
+    starts, ends = spans[0::2], spans[1::2]
+
+    # The values are parsed in one go, a space apart; float() on each one
+    # is left to find the one that is not a number
+    space = len(data)
+    spaced = _gather(np.append(data, np.uint8(ord(' '))),
+                     np.column_stack((starts, np.full(count, space))).ravel(),
+                     np.column_stack((ends, np.full(count, space + 1))).ravel())
+    try:
+        values = np.array(spaced.tobytes().split(), dtype=float)
+    except ValueError:
+        values = None
+    if values is None or len(values) != count:
+        values = np.array([float(data[start:end].tobytes()) for start, end in zip(starts, ends)])
+
+    text = np.frombuffer(format_numbers(apply(values.reshape(len(tags), -1))), dtype=np.uint8)
+    commas = np.flatnonzero(text == ord(','))
+    return starts, ends, text, np.concatenate(([0], commas + 2)), np.concatenate((commas, [len(text)]))
+
+
+def _splice(data, edits, end):
+    # data up to end, with the values in edits replaced by their new text
+    if not edits:
+        return data[:end].tobytes()
+    sources = [data]
+    starts, ends, text_starts, text_ends = [], [], [], []
+    offset = len(data)
+    for value_starts, value_ends, text, new_starts, new_ends in edits:
+        starts.append(value_starts)
+        ends.append(value_ends)
+        text_starts.append(new_starts + offset)
+        text_ends.append(new_ends + offset)
+        sources.append(text)
+        offset += len(text)
+    starts, ends, text_starts, text_ends = (np.concatenate(parts) for parts in (starts, ends, text_starts, text_ends))
+    order = np.argsort(starts, kind='stable')
+
+    # Every value's new text, after the bytes between it and the one before
+    segment_starts = np.empty(2 * len(order) + 1, dtype=np.int64)
+    segment_ends = np.empty_like(segment_starts)
+    segment_starts[0::2] = np.concatenate(([0], ends[order]))
+    segment_ends[0::2] = np.concatenate((starts[order], [end]))
+    segment_starts[1::2] = text_starts[order]
+    segment_ends[1::2] = text_ends[order]
+    return _gather(np.concatenate(sources), segment_starts, segment_ends).tobytes()
+
+
+def _gather(source, starts, ends):
+    # The bytes of source from each start to its end, one run after another
+    lengths = ends - starts
+    positions = np.cumsum(lengths) - lengths
+    return source[np.arange(positions[-1] + lengths[-1]) + np.repeat(starts - positions, lengths)]
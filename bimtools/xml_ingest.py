@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+from bimtools.html_ingest import CHUNK_SIZE, iter_chunks
+from bimtools.parse_cache import cached_parse
+
+
+POSITION_COLUMNS = ['Position X', 'Position Y', 'Position Z']
+# Camera rotation quaternion as Navisworks writes it, <quaternion a b c d>
+ROTATION_COLUMNS = ['Rotation A', 'Rotation B', 'Rotation C', 'Rotation D']
+VIEWPOINT_COLUMNS = (['View Name', 'Folders'] + POSITION_COLUMNS + ROTATION_COLUMNS
+                     + ['Clip Planes', 'Redline'])
+VIEWPOINT_PROFILE = 'viewpoints'
+
+_POSITION_PATH = ['view', 'viewpoint', 'camera', 'position', 'pos3f']
+_ROTATION_PATH = ['view', 'viewpoint', 'camera', 'rotation', 'quaternion']
+
+
+class _ViewLevels:
+    # Parser target: lxml calls start/end for each tag and builds no tree
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.folders = []
+        # Tags open inside the current view, whose children are not folders
+        self.path = []
+        self.views = []
+
+    def start(self, tag, attrib):
+        if self.path:
+            self.path.append(tag)
+            self.view_element(tag, attrib)
+        elif tag == 'view':
+            self.path.append(tag)
+            self.view(attrib)
+        else:
+            self.folders.append(attrib.get('name', self.folders[-1] if self.folders else None))
+
+    def end(self, tag):
+        if self.path:
+            self.view_element_end()
+            self.path.pop()
+        else:
+            self.folders.pop()
+
+    def close(self):
+        pass
+
+    def view(self, attrib):
+        levels = self.folders[-self.depth:]
+        self.views.append((attrib.get('name'), *[None] * (self.depth - len(levels)), *levels))
+
+    def view_element(self, tag, attrib):
+        pass
+
+    def view_element_end(self):
+        pass
+
+
+class _Viewpoints(_ViewLevels):
+    # Fills one list per column, the last entry being the open view
+
+    def __init__(self):
+        super().__init__(0)
+        self.names, self.folder_paths, self.clip_planes, self.redlines = [], [], [], []
+        self.positions, self.rotations = [], []
+        self.clipping = False
+        # Text pieces of the view's first redline, while it is being read
+        self.redline = None
+
+    def view(self, attrib):
+        self.names.append(attrib.get('name'))
+        self.folder_paths.append(tuple(self.folders))
+        self.positions.append((np.nan,) * 3)
+        self.rotations.append((np.nan,) * 4)
+        self.clip_planes.append(0)
+        self.redlines.append(None)
+
+    def view_element(self, tag, attrib):
+        if self.path == _POSITION_PATH:
+            self.positions[-1] = (_number(attrib, 'x'), _number(attrib, 'y'), _number(attrib, 'z'))
+        elif self.path == _ROTATION_PATH:
+            self.rotations[-1] = tuple(_number(attrib, key) for key in 'abcd')
+        elif tag == 'clipplaneset':
+            self.clipping = attrib.get('enabled') == '1'
+        elif tag == 'clipplane':
+            if self.clipping and attrib.get('state') == 'enabled':
+                self.clip_planes[-1] += 1
+        elif (tag == 'text' and self.path[-2] == 'rltext'
+              and self.redlines[-1] is None and self.redline is None):
+            self.redline = []
+
+    def view_element_end(self):
+        if self.redline is not None and self.path[-1] == 'text':
+            self.redlines[-1] = ''.join(self.redline) or None
+            self.redline = None
+
+    def data(self, text):
+        if self.redline is not None:
+            self.redline.append(text)
+
+    def table(self):
+        positions = np.array(self.positions, dtype=float).reshape(-1, 3)
+        rotations = np.array(self.rotations, dtype=float).reshape(-1, 4)
+        columns = {'View Name': self.names, 'Folders': self.folder_paths}
+        columns.update(zip(POSITION_COLUMNS, positions.T))
+        columns.update(zip(ROTATION_COLUMNS, rotations.T))
+        columns['Clip Planes'] = np.array(self.clip_planes, dtype=int)
+        columns['Redline'] = self.redlines
+        return pd.DataFrame(columns, columns=VIEWPOINT_COLUMNS)
+
+
+def _number(attrib, key):
+    value = attrib.get(key)
+    return np.nan if value is None else float(value)
+
+
+def iter_view_levels(source, depth=3, chunk_size=CHUNK_SIZE):
+    """Yield (view name, *folder levels) for every view in a viewpoint export.
+
+    The levels are the names of the `depth` folders enclosing the view,
+    outermost first, so with the default depth a view filed under
+    Issues Type / Issues Status / Sub Zone yields
+    (view name, issues type, issues status, sub zone). Missing levels are
+    None, and an unnamed element counts as a level named like its parent.
+
+    The export is fed to lxml in chunks and no tree is built, only the
+    names of the open folders are kept, so memory stays bounded by the
+    nesting depth rather than the size of the export.
+    """
+    target = _ViewLevels(depth)
+    parser = etree.XMLParser(target=target)
+    for chunk in iter_chunks(source, chunk_size):
+        parser.feed(chunk)
+        yield from target.views
+        target.views.clear()
+    parser.close()
+    yield from target.views
+
+
+def read_viewpoints(source, chunk_size=CHUNK_SIZE):
+    """Read every view of a viewpoint export into one table, in one pass.
+
+    One row per view, in document order, with columns:
+    View Name, Folders (names of the enclosing elements as in
+    iter_view_levels, outermost first), the camera position and rotation
+    quaternion (POSITION_COLUMNS, ROTATION_COLUMNS, NaN when missing),
+    Clip Planes (number of enabled clip planes) and Redline (text of the
+    first redline text, or None). The numeric columns are float arrays, so
+    table[POSITION_COLUMNS].to_numpy() gives an (n, 3) array.
+    """
+    target = _Viewpoints()
+    parser = etree.XMLParser(target=target)
+    for chunk in iter_chunks(source, chunk_size):
+        parser.feed(chunk)
+    parser.close()
+    return target.table()
+
+
+def viewpoint_table(uploaded_file):
+    """read_viewpoints() of an upload, cached by the SHA-256 of its bytes."""
+    return cached_parse(VIEWPOINT_PROFILE, (uploaded_file,), read_viewpoints)
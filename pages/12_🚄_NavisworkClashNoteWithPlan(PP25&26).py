@@ -1,34 +1,26 @@
 import streamlit as st
 import pandas as pd
-from reportlab.platypus import Table, Image, Spacer, Paragraph, PageTemplate, Frame, BaseDocTemplate
 from reportlab.lib import colors
-from reportlab.lib.pagesizes import landscape, A3
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_LEFT
 from reportlab.lib.units import inch
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import (SimpleDocTemplate, Table, TableStyle, Frame, 
-                                PageTemplate, BaseDocTemplate, Image as ReportlabImage, 
-                                Paragraph, Spacer)
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from PIL import Image as pil_image
 import xml.etree.ElementTree as ET
-import zipfile
 import time
 from io import BytesIO
-import os
-import shutil
-import tempfile
-from bs4 import BeautifulSoup
-from PIL import Image as PIL_Image
+from bimtools.html_ingest import read_report_tables
+from bimtools.image_store import resolve_images, session_image_store
+from bimtools.job_panel import queue_report, show_report_jobs
+from bimtools.parse_cache import cached_parse
+from bimtools.report_resources import report_resources
+from bimtools.report_template import DetailField, HeaderColours, ImageSlot, NoteReport, WideReport, plan_report
+from bimtools.thumbnails import preview_image
+from bimtools.view_schema import ViewNameSchema
+from bimtools.dates import format_dates, normalize_dates
+from bimtools.tracking import merge_tracking_report
 import datetime
 
 EXTRACTED_FLAG = False
+PROJECT_PROFILE = 'PP25&26'
+DATE_DISPLAY_FORMAT = "%m/%d/%Y"
+VIEW_NAME_SCHEMA = ViewNameSchema(['Clash ID', 'Date Found', 'Main Zone', 'Sub Zone', 'Level', 'Discipline', 'Description', 'Issues Type'])
 
 st.set_page_config(page_title='Naviswork Clash Issues Report & Note (PP)', page_icon=":station:", layout='centered')
 
@@ -36,19 +28,7 @@ css_file = "styles/main.css"
 with open(css_file) as f:
     st.markdown("<style>{}</style>".format(f.read()), unsafe_allow_html=True)
 
-pdfmetrics.registerFont(TTFont('Sarabun', r'./Font/THSarabunNew.ttf'))
-pdfmetrics.registerFont(TTFont('Sarabun-Bold', r'./Font/THSarabunNew Bold.ttf'))
-
-def adjust_convert_date_format(date_str):
-    # Check if the date is already in 'YYYY-MM-DD' format
-    if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
-        return date_str
-    # Adjusted function to handle the date format 'YYMMDD'
-    try:
-        formatted_date = "20" + date_str[:2] + "-" + date_str[2:4] + "-" + date_str[4:6]
-        return formatted_date  # We already have it in 'YYYY-MM-DD' format, so no need for extra conversion
-    except:
-        return None
+report_resources.register_fonts()
 
 
 
@@ -59,65 +39,31 @@ def extract_grid_value(view_name):
         return parts[2]
     return None
 
-def process_html_to_dfs(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    h2_tags = soup.find_all('h2')
-    data = []
-
-    for h2 in h2_tags:
-        view_name = h2.text.strip()
-        img = h2.find_next('img')
-        img_src = img['src'].split('/')[-1] if img else None  # Extract just the filename from the src
-        clash_id = view_name.split('_')[0]  # Extract the Clash ID by splitting the view name on underscore
-        data.append((clash_id, view_name, img_src))
-
-    full_df = pd.DataFrame(data, columns=['Clash ID', 'View Name', 'Image'])
+def process_html_to_dfs(tables):
     
     # Filter the rows based on the view name patterns
-    df1 = full_df[full_df['View Name'].str.contains("_View \(Plan\)")]
-    df2 = full_df[full_df['View Name'].str.contains("_View \(Section\)")]
+    df1 = tables.plans[tables.plans['View Name'].str.contains("_View \(Plan\)")]
+    df2 = tables.sections[tables.sections['View Name'].str.contains("_View \(Section\)")]
     
     # Extract grid value for df2
     df2['Grid'] = df2['View Name'].apply(extract_grid_value)
 
     return df1, df2
 
-def process_html_content(html_content):
-    df1, df2 = process_html_to_dfs(html_content)
-
-    soup = BeautifulSoup(html_content, 'html.parser')
-    h2_tags = soup.find_all('h2')
-    data = []
+def process_html_content(html_file):
+    tables = read_report_tables(html_file)
+    df1, df2 = process_html_to_dfs(tables)
 
-    for h2 in h2_tags:
-        img = h2.find_next('img')
-        img_src = img['src'].split('/')[-1] if img else None  # Extract just the filename from the src
-        data.append((h2.text.strip(), img_src))
-
-    df = pd.DataFrame(data, columns=['View Name', 'Image'])
-    multiple_underscores_df = df[df['View Name'].str.count('_') > 2]
-    filtered_no_asterisk_df = multiple_underscores_df[~multiple_underscores_df['View Name'].str.contains('\*')]
-    
-    split_columns = filtered_no_asterisk_df['View Name'].str.split('_', expand=True)
-    renamed_columns = {
-        0: "Clash ID",
-        1: "Date Found",
-        2: "Main Zone",
-        3: "Sub Zone",
-        4: "Level",
-        5: "Discipline",
-        6: "Description",
-        7: "Issues Type"
-    }
-    split_columns = split_columns.rename(columns=renamed_columns)
-    expanded_df = pd.concat([filtered_no_asterisk_df, split_columns], axis=1)
+    df = tables.views[['View Name', 'Image']]
+    fields, view_name_stats = VIEW_NAME_SCHEMA.decompose(df['View Name'])
+    expanded_df = df.loc[fields.index].join(fields)
 
     if 'Date Found' in expanded_df.columns:
-        expanded_df['Formatted Date'] = expanded_df['Date Found'].apply(adjust_convert_date_format)
+        expanded_df['Date Found'] = normalize_dates(expanded_df['Date Found'])
     else:
-        expanded_df['Formatted Date'] = None
+        expanded_df['Date Found'] = pd.NaT
 
-    filtered_date_df = expanded_df.dropna(subset=['Formatted Date'])
+    filtered_date_df = expanded_df.dropna(subset=['Date Found'])
     filtered_date_df['Issues Status'] = ""
 
     desired_order = ["Clash ID", "View Name", "Date Found", "Main Zone", "Sub Zone", "Level", 
@@ -144,7 +90,7 @@ def process_html_content(html_content):
     final_merged_df = pd.merge(merged_df, df2[['Clash ID', 'Grid']], on='Clash ID', how='left')
     final_merged_df_filtered = final_merged_df.dropna(subset=['Date Found'])
 
-    return final_merged_df_filtered
+    return final_merged_df_filtered, view_name_stats
 
 
 
@@ -176,388 +122,77 @@ def process_xml_content(xml_content):
     return filtered_df
     
 
-def extract_images_from_zip(uploaded_zip_file):
-    extracted_images = []
-    
-    # Create a temporary directory to extract files into
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        # Save the uploaded file to a temporary file
-        temp_zip_path = os.path.join(tmpdirname, 'temp.zip')
-        with open(temp_zip_path, 'wb') as f:
-            f.write(uploaded_zip_file.getvalue())
-        
-        # Extract the zip file
-        shutil.unpack_archive(temp_zip_path, tmpdirname)
-
-        # Walk through the extracted files and pick up images
-        for subdir, _, files in os.walk(tmpdirname):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    file_path = os.path.join(subdir, file)
-                    with open(file_path, 'rb') as f:
-                        extracted_images.append((file, f.read()))
-
-    return extracted_images
-
 DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y"]
-def try_parsing_date(text):
-    for fmt in DATE_FORMATS:
-        try:
-            return pd.to_datetime(text, format=fmt).strftime("%m/%d/%Y")
-        except ValueError:
-            pass
-    # If all formats fail, return the original string
-    return text
-
-
-def generate_pdf(df, project_name):
-    class MyDocTemplate(BaseDocTemplate):
-        def __init__(self, filename, **kwargs):
-            BaseDocTemplate.__init__(self, filename, **kwargs)
-            page_width, page_height = landscape(A3)
-            frame_width = page_width - 2*0.7*inch
-            frame_height = page_height - 2*0.7*inch
-            frame = Frame(0.7*inch, 0.7*inch, frame_width, frame_height, id='F1')
-            template = PageTemplate('normal', [frame], onPage=self.add_page_decorations)
-            self.addPageTemplates([template])
-
-        def add_page_decorations(self, canvas, doc):
-            with pil_image.open(logo_path) as img:
-                width, height = img.size
-            aspect = width / height
-            new_height = 0.25 * inch
-            new_width = new_height * aspect
-
-            canvas.drawImage(logo_path, 0.2*inch, doc.height + 1.5*inch, width=new_width, height=new_height)
-
-            canvas.setFont("Sarabun-Bold", 30)
-            canvas.drawCentredString(doc.width/2 + 0.5*inch, doc.height + 1.2*inch + 0.25*inch, project_name)
-
-            timestamp = time.strftime("%Y/%m/%d %H:%M:%S")
-            canvas.setFont("Sarabun-Bold", 10)
-            canvas.drawRightString(doc.width + inch, doc.height + inch + 0.75*inch, f"Generated on: {timestamp}")
-
-    logo_path = r"./Media/1-Aurecon-logo-colour-RGB-Positive.png"
-
-    output = BytesIO()
-    pdf = MyDocTemplate(output, pagesize=landscape(A3))
-
-    styles = getSampleStyleSheet()
-    cell_style = styles["Normal"]
-    cell_style.fontName = "Sarabun"
-    cell_style.alignment = TA_LEFT
-
-    content = []
-
-    header_style = ParagraphStyle(
-        "HeaderStyle",
-        parent=styles["Normal"],
-        fontName="Sarabun-Bold",
-        fontSize=18,
-        textColor=colors.white,
-        alignment=TA_LEFT,
-        spaceAfter=12,
-        leftIndent=6,
-        leading=16,
-    )
-
-    table_style = [
-        ('BACKGROUND', (0, 0), (-1, 0), colors.purple),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, 0), (-1, -1), 'Sarabun'),
-        ('FONTSIZE', (0, 0), (-1, 0), 16),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('STYLE', (0, 0), (-1, -1), cell_style),
-    ]
-
-    header_data = [Paragraph(cell, header_style) for cell in df.columns.tolist()]
-    column_order = ["Clash ID", "Image", "View Name", "Date Found", "Main Zone", "Sub Zone", "Level",
-                    "Issues Type", "Issues Status", "Description", "Discipline"]
-    header_data_reordered = [header_data[df.columns.get_loc(col)] for col in column_order]
-    content = []
-
-    for _, row in df.iterrows():
-        img_data = row['Image']
-        if img_data != "Image not found":
-            if isinstance(img_data, BytesIO):  # If it's already a BytesIO object
-                image_stream = img_data
-            else:
-                image_stream = BytesIO(img_data.getvalue())
-            img_data.seek(0)  # Reset the file pointer
-            img = Image(image_stream, width=150, height=150)
-        else:
-            img = 'Image not found'
-
-        row_data = [
-            Paragraph(str(row["Clash ID"]), cell_style),
-            img,
-            Paragraph(str(row["View Name"]), cell_style),
-            Paragraph(str(row["Date Found"]), cell_style),
-            Paragraph(str(row["Main Zone"]), cell_style),
-            Paragraph(str(row["Sub Zone"]), cell_style),
-            Paragraph(str(row["Level"]), cell_style),
-            Paragraph(str(row["Issues Type"]), cell_style),
-            Paragraph(str(row["Issues Status"]), cell_style),
-            Paragraph(str(row["Description"]), cell_style),
-            Paragraph(str(row["Discipline"]), cell_style),
-            
-        ]
-        content.append(row_data)
-
-    data = [header_data_reordered] + content
-    col_widths = [100, 170, 80, 80, 80, 80, 80, 80, 80, 90, 80]
-    table = Table(data, colWidths=col_widths, repeatRows=1, style=table_style)
-    elems = [table]
-    pdf.build(elems)
-    output.seek(0)
-    return output
-
-pdfmetrics.registerFont(TTFont('Sarabun', r'./Font/THSarabunNew.ttf'))
-pdfmetrics.registerFont(TTFont('Sarabun-Bold', r'./Font/THSarabunNew Bold.ttf'))
-
-def formatted_paragraph(text, styles):
-    bold_style = ParagraphStyle("BoldStyle", parent=styles["Normal"], fontName="Sarabun-Bold")
-    light_style = ParagraphStyle("LightStyle", parent=styles["Normal"], fontName="Sarabun")
-
-    # Split the text into bold and light parts using the custom tags
-    parts = text.split("<l>")
-    bold_text = parts[0].replace("<b>", "").replace("</b>", "").strip()
-    light_text = parts[1].replace("</l>", "").strip()
-
-    # Create Paragraph objects for each part
-    bold_part = Paragraph(bold_text, style=bold_style)
-    light_part = Paragraph(light_text, style=light_style)
-
-    return bold_part, light_part
-
-
-def generate_pdf2(df, project_name):
-    class MyDocTemplate(BaseDocTemplate):
-        def __init__(self, filename, **kwargs):
-            BaseDocTemplate.__init__(self, filename, **kwargs)
-            page_width, page_height = A4
-            frame_width = page_width
-            frame_height = 0.8 * page_height
-            frame_x = (page_width - frame_width) / 2
-            frame_y = (page_height - frame_height) / 2
-            frame = Frame(frame_x, frame_y, frame_width, frame_height, id='F1')
-            template = PageTemplate('normal', [frame], onPage=self.add_page_decorations)
-            self.addPageTemplates([template])
-        def add_page_decorations(self, canvas, doc):
-            with pil_image.open(logo_path) as img:
-                width, height = img.size
-            aspect = width / height
-            new_height = 0.25 * inch
-            new_width = new_height * aspect
-            canvas.drawImage(logo_path, 0.2*inch, doc.height + 1.5*inch, width=new_width, height=new_height)
-            canvas.setFont("Sarabun-Bold", 26)
-            # Adjusting the Y position (doc.height + ...) to a smaller value will lower the project name
-            canvas.drawCentredString(page_width/2, doc.height + 1.0*inch, project_name)
-            timestamp = time.strftime("%Y/%m/%d")
-            canvas.setFont("Sarabun-Bold", 10)
-            canvas.drawRightString(page_width - 0.2*inch, page_height - 0.2*inch, f"Generated on: {timestamp}")
-
-    logo_path = r"./Media/1-Aurecon-logo-colour-RGB-Positive.png"
-    output = BytesIO()
-    pdf = MyDocTemplate(output, pagesize=A4)
-    story = []
-    header_data = ["No.", "Image", "Details", "Note"]
-    styles = getSampleStyleSheet()
- 
-    data = [header_data]
-    for idx, (index, row) in enumerate(df.iterrows(), 1):
-        img_data = row['Image']
-        if img_data != "Image not found":
-            if isinstance(img_data, BytesIO):  # If it's already a BytesIO object
-                image_stream = img_data
-            else:
-                image_stream = BytesIO(img_data.getvalue())
-            img_data.seek(0)  # Reset the file pointer to the start
-            image_path = ReportlabImage(image_stream, width=2.4*inch, height=2.4*inch)
-        else:
-            image_path = "Image Not Found"
-
-        details_list = []
-        texts = [
-            f"<b>Clash ID:</b> <l>{row['Clash ID']}</l>",
-            f"<b>Date Found:</b> <l>{row['Date Found']}</l>",
-            f"<b>Main Zone:</b> <l>{row['Main Zone']}</l>",
-            f"<b>Sub Zone:</b> <l>{row['Sub Zone']}</l>",
-            f"<b>Level:</b> <l>{row['Level']}</l>",
-            f"<b>Grid:</b> <l>{row['Grid']}</l>",
-            f"<b>Description:</b> <l>{row['Description']}</l>",
-            f"<b>Discipline:</b> <l>{row['Discipline']}</l>",
-            f"<b>Issue Type:</b> <l>{row['Issues Type']}</l>",
-            f"<b>Issue Status:</b> <l>{row['Issues Status']}</l>",
-            f"<b>Due Date:</b> <l>{row['Due Date']}</l>"
-        ]
-        for text in texts:
-            bold_part, light_part = formatted_paragraph(text, styles)
-            details_list.append(bold_part)
-            details_list.append(light_part)
-        details_list.append(Spacer(1, 0.1*inch))
-
-       # new code for note column
-        if row['Notes']:
-            note_lines = row['Notes'].splitlines()
-            light_style = ParagraphStyle("LightStyle", parent=styles["Normal"], fontName="Sarabun")
-            note_paragraphs = [Paragraph(f"{note_lines[0]}", style=light_style)]
-            for line in note_lines[1:]:
-                note_paragraphs.append(Paragraph(f"{line}", style=light_style))
-        else:
-            note_paragraphs = [Spacer(1, 0.1*inch)]  # Use a Spacer instead of plain string
-
-        data.append([str(idx), image_path, details_list, note_paragraphs])
-
-
-    page_width, page_height = A4 
-    col_widths = [(0.05 * page_width), (0.3 * page_width), (0.3* page_width), (0.3* page_width)]
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), '#f0ceff'),
-        ('TEXTCOLOR', (0, 0), (-1, 0), '#333333'),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Sarabun-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 18),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), '#ffffff'),
-        ('GRID', (0, 0), (-1, -1), 1, '#2B2B2B'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Sarabun'),
-        ('FONTSIZE', (1, 1), (1, -1), 16),
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (0, 0), 'Sarabun-Bold'),
-        ('FONTSIZE', (0, 0), (0, -1), 16)
-    ])
-    table = Table(data, colWidths=col_widths, repeatRows=1, style=table_style)
-    story.append(table)
-    pdf.build(story)
-    return output.getvalue()
-
-
-
-
-def generate_pdf3(df, project_name):
-    class MyDocTemplate(BaseDocTemplate):
-        def __init__(self, filename, **kwargs):
-            BaseDocTemplate.__init__(self, filename, **kwargs)
-            page_width, page_height = landscape(A3)
-            frame_width = page_width
-            frame_height = 0.8 * page_height
-            frame_x = (page_width - frame_width) / 2
-            frame_y = (page_height - frame_height) / 2
-            frame = Frame(frame_x, frame_y, frame_width, frame_height, id='F1')
-            template = PageTemplate('normal', [frame], onPage=self.add_page_decorations)
-            self.addPageTemplates([template])
-        def add_page_decorations(self, canvas, doc):
-            with pil_image.open(logo_path) as img:
-                width, height = img.size
-            aspect = width / height
-            new_height = 0.25 * inch
-            new_width = new_height * aspect
-            canvas.drawImage(logo_path, 0.2*inch, doc.height + 1.5*inch, width=new_width, height=new_height)
-            canvas.setFont("Sarabun-Bold", 30)
-            canvas.drawCentredString(doc.width/2 + 0.5*inch, doc.height + 1.0*inch + 0.25*inch, project_name)
-            timestamp = time.strftime("%Y/%m/%d")
-            canvas.setFont("Sarabun-Bold", 10)
-            canvas.drawRightString(page_width - 0.2*inch, page_height - 0.2*inch, f"Generated on: {timestamp}")
-
-    logo_path = r"./Media/1-Aurecon-logo-colour-RGB-Positive.png"
-    output = BytesIO()
-    pdf = MyDocTemplate(output, pagesize=landscape(A3))
-    story = []
-    header_data = ["No.", "Image", "Plan", "Section", "Details", "Note"]
-    styles = getSampleStyleSheet()
- 
-    data = [header_data]
-    for idx, (index, row) in enumerate(df.iterrows(), 1):
-        img_data = row['Image']
-        if img_data != "Image not found":
-            if isinstance(img_data, BytesIO):  # If it's already a BytesIO object
-                image_stream = img_data
-            else:
-                image_stream = BytesIO(img_data.getvalue())
-            img_data.seek(0)  # Reset the file pointer to the start
-            image_path = ReportlabImage(image_stream, width=2.8*inch, height=2.8*inch)
-        else:
-            image_path = "Image Not Found"
-
-        if isinstance(row['Image_Plan'], BytesIO):
-            plan_image_stream = row['Image_Plan']
-            plan_image_path = ReportlabImage(plan_image_stream, width=2.8*inch, height=2.8*inch)
-        else:
-            plan_image_path = "Plan Image Not Found"
-
-        # Handling the Section image
-        if isinstance(row['Image_Section'], BytesIO):
-            section_image_stream = row['Image_Section']
-            section_image_path = ReportlabImage(section_image_stream, width=2.8*inch, height=2.8*inch)
-        else:
-            section_image_path = "Section Image Not Found"
-
-
-        details_list = []
-        texts = [
-            f"<b>Clash ID:</b> <l>{row['Clash ID']}</l>",
-            f"<b>Date Found:</b> <l>{row['Date Found']}</l>",
-            f"<b>Main Zone:</b> <l>{row['Main Zone']}</l>",
-            f"<b>Sub Zone:</b> <l>{row['Sub Zone']}</l>",
-            f"<b>Level:</b> <l>{row['Level']}</l>",
-            f"<b>Grid:</b> <l>{row['Grid']}</l>",
-            f"<b>Description:</b> <l>{row['Description']}</l>",
-            f"<b>Discipline:</b> <l>{row['Discipline']}</l>",
-            f"<b>Issue Type:</b> <l>{row['Issues Type']}</l>",
-            f"<b>Issue Status:</b> <l>{row['Issues Status']}</l>",
-            f"<b>Due Date:</b> <l>{row['Due Date']}</l>"
-        ]
-        for text in texts:
-            bold_part, light_part = formatted_paragraph(text, styles)
-            details_list.append(bold_part)
-            details_list.append(light_part)
-        details_list.append(Spacer(1, 0.1*inch))
-
-       # new code for note column
-        if row['Notes']:
-            note_lines = row['Notes'].splitlines()
-            light_style = ParagraphStyle("LightStyle", parent=styles["Normal"], fontName="Sarabun")
-            note_paragraphs = [Paragraph(f"{note_lines[0]}", style=light_style)]
-            for line in note_lines[1:]:
-                note_paragraphs.append(Paragraph(f"{line}", style=light_style))
-        else:
-            note_paragraphs = [Spacer(1, 0.1*inch)]  # Use a Spacer instead of plain string
-
-        data.append([str(idx), image_path, plan_image_path, section_image_path, details_list, note_paragraphs])
-
-
-    page_width, page_height = A3 
-    col_widths = [(0.05 * page_width), (0.255 * page_width), (0.255* page_width), (0.255* page_width), (0.2* page_width), (0.35* page_width)]
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), '#f0ceff'),
-        ('TEXTCOLOR', (0, 0), (-1, 0), '#333333'),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Sarabun-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 18),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), '#ffffff'),
-        ('GRID', (0, 0), (-1, -1), 1, '#2B2B2B'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Sarabun'),
-        ('FONTSIZE', (1, 1), (1, -1), 16),
-        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (0, 0), 'Sarabun-Bold'),
-        ('FONTSIZE', (0, 0), (0, -1), 16)
-    ])
-    table = Table(data, colWidths=col_widths, repeatRows=1, style=table_style)
-    story.append(table)
-    pdf.build(story)
-    return output.getvalue()
 
 
+generate_pdf = WideReport(
+    columns=["Clash ID", "Image", "View Name", "Date Found", "Main Zone", "Sub Zone",
+             "Level", "Issues Type", "Issues Status", "Description", "Discipline"],
+    col_widths=[100, 170, 80, 80, 80, 80, 80, 80, 80, 90, 80],
+    header=HeaderColours(colors.purple, colors.whitesmoke),
+)
+
+
+generate_pdf2 = NoteReport(
+    images=[ImageSlot("Image", "Image", 2.4*inch, "Image Not Found")],
+    details=[
+        DetailField("Clash ID", "Clash ID"),
+        DetailField("Date Found", "Date Found"),
+        DetailField("Main Zone", "Main Zone"),
+        DetailField("Sub Zone", "Sub Zone"),
+        DetailField("Level", "Level"),
+        DetailField("Grid", "Grid"),
+        DetailField("Description", "Description"),
+        DetailField("Discipline", "Discipline"),
+        DetailField("Issue Type", "Issues Type"),
+        DetailField("Issue Status", "Issues Status"),
+        DetailField("Due Date", "Due Date"),
+    ],
+    col_widths=[0.05, 0.3, 0.3, 0.3],
+    header=HeaderColours('#f0ceff', '#333333'),
+)
+
+
+generate_pdf3 = plan_report(
+    images=[
+        ImageSlot("Image", "Image", 2.8*inch, "Image Not Found"),
+        ImageSlot("Plan", "Image_Plan", 2.8*inch, "Plan Image Not Found"),
+        ImageSlot("Section", "Image_Section", 2.8*inch, "Section Image Not Found"),
+    ],
+    details=[
+        DetailField("Clash ID", "Clash ID"),
+        DetailField("Date Found", "Date Found"),
+        DetailField("Main Zone", "Main Zone"),
+        DetailField("Sub Zone", "Sub Zone"),
+        DetailField("Level", "Level"),
+        DetailField("Grid", "Grid"),
+        DetailField("Description", "Description"),
+        DetailField("Discipline", "Discipline"),
+        DetailField("Issue Type", "Issues Type"),
+        DetailField("Issue Status", "Issues Status"),
+        DetailField("Due Date", "Due Date"),
+    ],
+    col_widths=[0.05, 0.255, 0.255, 0.255, 0.2, 0.35],
+    header=HeaderColours('#f0ceff', '#333333'),
+)
+
+
+def merge_html_xml(html_file, xml_file):
+    df_html, view_name_stats = process_html_content(html_file)
+
+    xml_content = xml_file.read().decode('utf-8')
+    df_xml = process_xml_content(xml_content)
+
+    # Merge on "View Name"
+    merged_df = pd.merge(df_html.drop(columns="Issues Status"), df_xml, on="View Name", how="left")
+    merged_df = merged_df.rename(columns={"Grid_x": "Grid"}).drop(columns=["Grid_y"])
 
+    desired_order = ["Clash ID", "View Name", "Date Found", "Main Zone", "Sub Zone", "Level", 
+        "Issues Type", "Issues Status", "Description", "Discipline", "Image", 
+        "View Name_Plan", "Image_Plan", "View Name_Section", "Image_Section", "Grid"]
 
+    merged_df = merged_df[desired_order]
+    return merged_df, view_name_stats
 
 
 st.title('Naviswork Clash Issues Report & Note (Purple Line)')
@@ -570,25 +205,9 @@ xml_file = st.file_uploader("Upload XML File", type=['xml'])
     
 if html_file and xml_file:  # Check that both files are uploaded
     try:
-        html_content = html_file.read().decode('utf-8')
-        df_html = process_html_content(html_content)
-        
-        xml_content = xml_file.read().decode('utf-8')
-        df_xml = process_xml_content(xml_content)
-        
-        # Merge on "View Name"
-        merged_df = pd.merge(df_html.drop(columns="Issues Status"), df_xml, on="View Name", how="left")
-        merged_df = merged_df.rename(columns={"Grid_x": "Grid"}).drop(columns=["Grid_y"])
-
-        # Apply the date formatting function to the entire "Date Found" column of merged_df
-        if "Date Found" in merged_df.columns:
-            merged_df["Date Found"] = merged_df["Date Found"].apply(adjust_convert_date_format)
-
-        desired_order = ["Clash ID", "View Name", "Date Found", "Main Zone", "Sub Zone", "Level", 
-            "Issues Type", "Issues Status", "Description", "Discipline", "Image", 
-            "View Name_Plan", "Image_Plan", "View Name_Section", "Image_Section", "Grid"]
-
-        merged_df = merged_df[desired_order]
+        merged_df, view_name_stats = cached_parse(PROJECT_PROFILE, (html_file, xml_file), merge_html_xml)
+        with st.expander("View name fields"):
+            st.table(view_name_stats)
         
 
         if not merged_df.empty:
@@ -600,20 +219,11 @@ if html_file and xml_file:  # Check that both files are uploaded
 
 uploaded_files = st.file_uploader("Upload Images or ZIP of Images", type=['jpg', 'jpeg', 'png', 'zip', 'application/x-zip-compressed'], accept_multiple_files=True)
 
-image_dict = {}
-
-
+# Kept across reruns, so images are only inflated once per upload
+image_dict = session_image_store(uploaded_files, st.session_state)
 
-for uploaded_file in uploaded_files:
-    file_type = uploaded_file.type
-    if file_type in ['application/zip', 'application/x-zip-compressed']:
-        extracted_images = extract_images_from_zip(uploaded_file)
-        for img_name, img_data in extracted_images:
-            image_dict[img_name] = BytesIO(img_data)
-    elif file_type in ['image/jpeg', 'image/jpg', 'image/png']:
-        image_dict[uploaded_file.name] = uploaded_file
-    else:
-        st.write(f"Unsupported file type: {file_type}")
+for file_type in image_dict.unsupported:
+    st.write(f"Unsupported file type: {file_type}")
 
 
 
@@ -622,14 +232,14 @@ merged_df_display = merged_df.copy()
 # Replace the "Image" column with the actual image objects for processing
 if "Image" in merged_df.columns:
     merged_df["ImageName"]=merged_df["Image"]
-    merged_df["Image"] = merged_df["Image"].apply(lambda x: image_dict.get(x, "Image not found"))
-    
     merged_df["Image_Plan_Name"]=merged_df["Image_Plan"]
-    merged_df["Image_Plan"] = merged_df["Image_Plan"].apply(lambda x: image_dict.get(x, "Image not found"))
-
     merged_df["Image_Section_Name"]=merged_df["Image_Section"]
-    merged_df["Image_Section"] = merged_df["Image_Section"].apply(lambda x: image_dict.get(x, "Image not found"))
-    
+    # Only the images some row refers to are decompressed
+    merged_df, image_usage = resolve_images(merged_df, image_dict, ["Image", "Image_Plan", "Image_Section"])
+    with st.expander(f"Images: {len(image_usage.missing)} missing, {len(image_usage.unused)} unused"):
+        st.write("Missing:", ", ".join(image_usage.missing) or "None")
+        st.write("Unused:", ", ".join(image_usage.unused) or "None")
+
 if not merged_df.empty and "Issues Status" in merged_df.columns:
     available_statuses = merged_df["Issues Status"].unique().tolist()
 else:
@@ -644,12 +254,12 @@ if "Issues Status" in merged_df_display.columns:
     filtered_df_display = merged_df_display[merged_df_display["Issues Status"].isin(selected_statuses)]
 else:
     filtered_df_display = merged_df_display
-st.table(filtered_df_display.head(3))
+st.table(format_dates(filtered_df_display.head(3), DATE_DISPLAY_FORMAT))
 
 
 if st.button("Generate CSV"):
     #csv_data = merged_df.to_csv(index=False)
-    csv_data = filtered_df_display.to_csv(index=False, encoding='utf-8-sig')
+    csv_data = format_dates(filtered_df_display, DATE_DISPLAY_FORMAT).to_csv(index=False, encoding='utf-8-sig')
     st.download_button(
         label="Download CSV",
         data=csv_data.encode(),
@@ -658,13 +268,9 @@ if st.button("Generate CSV"):
         )
 
 if st.button("Generate Report"):
-    pdf_data = generate_pdf(filtered_df, project_name)
-    st.download_button(
-        label="Download PDF Report",
-        data=pdf_data,
-        file_name=f"{time.strftime('%Y%m%d')}_PDF-Wide-ClashReport_{project_name}.pdf",
-        mime="application/pdf"
-        )
+    queue_report(generate_pdf, format_dates(filtered_df, DATE_DISPLAY_FORMAT), project_name,
+                 file_name=f"{time.strftime('%Y%m%d')}_PDF-Wide-ClashReport_{project_name}.pdf",
+                 reuse_shards=False)  # stamped to the second
        
 
 
@@ -695,8 +301,7 @@ if selected_option == "Option 1: Display without merging":
         df["Notes"].fillna("", inplace=True)
         df["Usage"].fillna("Tracking", inplace=True)
         df["Assign"].fillna("", inplace=True)
-        #df["Date Found"] = pd.to_datetime(df["Date Found"]).dt.strftime("%m/%d/%Y")
-        df["Date Found"] = df["Date Found"].apply(try_parsing_date)
+        df["Date Found"] = normalize_dates(df["Date Found"], DATE_FORMATS)
         
 
         st.sidebar.header("Filter Options")
@@ -741,17 +346,17 @@ if selected_option == "Option 1: Display without merging":
         
         with col1:
             st.write(f"<b>{row['View Name']}</b>", unsafe_allow_html=True)
-            st.image(row['Image'], use_column_width=True)
+            st.image(preview_image(row['Image']), use_column_width=True)
 
             if row['Image_Plan'] == "Image not found":
                 st.write("Plan Image not found.")
             else:
-                st.image(row['Image_Plan'], use_column_width=True)
+                st.image(preview_image(row['Image_Plan']), use_column_width=True)
 
             if row['Image_Section'] == "Image not found":
                 st.write("Section Image not found.")
             else:
-                st.image(row['Image_Section'], use_column_width=True)
+                st.image(preview_image(row['Image_Section']), use_column_width=True)
         
         with col2:
             st.write(f"<b>Issue Type:</b> {row['Issues Type']}", unsafe_allow_html=True)
@@ -788,7 +393,7 @@ if selected_option == "Option 1: Display without merging":
         st.markdown("---")
         
     if st.button("Export CSV"):
-        csv_data = df_view.to_csv(encoding='utf-8-sig', index=False).encode('utf-8-sig')
+        csv_data = format_dates(df_view, DATE_DISPLAY_FORMAT).to_csv(encoding='utf-8-sig', index=False).encode('utf-8-sig')
         st.download_button(
             label="Download CSV",
             data=BytesIO(csv_data),
@@ -797,22 +402,12 @@ if selected_option == "Option 1: Display without merging":
             )
 
     if st.button("Generate ReportA4"):
-        pdf_data = generate_pdf2(df_view, project_name)
-        st.download_button(
-            label="Download PDF Report",
-            data=pdf_data,
-            file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReport_{project_name}.pdf",
-            mime="application/pdf"
-        )
+        queue_report(generate_pdf2, format_dates(df_view, DATE_DISPLAY_FORMAT), project_name,
+                     file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReport_{project_name}.pdf")
 
     if st.button("Generate Report With Plan"):
-        pdf_data = generate_pdf3(df_view, project_name)
-        st.download_button(
-            label="Download PDF Report",
-            data=pdf_data,
-            file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReportWithPlan_{project_name}.pdf",
-            mime="application/pdf"
-        )
+        queue_report(generate_pdf3, format_dates(df_view, DATE_DISPLAY_FORMAT), project_name,
+                     file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReportWithPlan_{project_name}.pdf")
 
 elif selected_option == "Option 2: Display with merging":
 
@@ -831,13 +426,10 @@ elif selected_option == "Option 2: Display with merging":
                 merged_df[col] = None
 
                 
-        # Loop-based approach for merging
-        for idx, row in merged_df.iterrows():
-            match_row = df_report[df_report["Clash ID"] == row["Clash ID"]]
-            if not match_row.empty:
-                for col in ['Notes', 'Usage', 'Due Date','Assign']:
-                    if pd.notna(match_row[col].values[0]):
-                        merged_df.at[idx, col] = match_row[col].values[0]
+        # Keyed join instead of scanning the CSV once per clash
+        merged_df, merge_counts = merge_tracking_report(merged_df, df_report, ['Notes', 'Usage', 'Due Date','Assign'])
+        st.write(f"Tracking CSV: {merge_counts.matched} matched, {merge_counts.new} new, "
+                 f"{merge_counts.orphaned} orphaned")
                  
         if 'df' not in st.session_state:
             st.session_state.df = merged_df.copy()
@@ -853,8 +445,7 @@ elif selected_option == "Option 2: Display with merging":
         df["Notes"].fillna("", inplace=True)
         df["Usage"].fillna("Tracking", inplace=True)
         df["Assign"].fillna("", inplace=True)
-        #df["Date Found"] = pd.to_datetime(df["Date Found"]).dt.strftime("%m/%d/%Y")
-        df["Date Found"] = df["Date Found"].apply(try_parsing_date)
+        df["Date Found"] = normalize_dates(df["Date Found"], DATE_FORMATS)
 
 
         st.sidebar.header("Filter Options")
@@ -902,17 +493,17 @@ elif selected_option == "Option 2: Display with merging":
         
         with col1:
             st.write(f"<b>{row['View Name']}</b>", unsafe_allow_html=True)
-            st.image(row['Image'], use_column_width=True)
+            st.image(preview_image(row['Image']), use_column_width=True)
             
             if row['Image_Plan'] == "Image not found":
                 st.write("Plan Image not found.")
             else:
-                st.image(row['Image_Plan'], use_column_width=True)
+                st.image(preview_image(row['Image_Plan']), use_column_width=True)
 
             if row['Image_Section'] == "Image not found":
                 st.write("Section Image not found.")
             else:
-                st.image(row['Image_Section'], use_column_width=True)
+                st.image(preview_image(row['Image_Section']), use_column_width=True)
         
         with col2:
             st.write(f"<b>Issue Type:</b> {row['Issues Type']}", unsafe_allow_html=True)
@@ -952,7 +543,7 @@ elif selected_option == "Option 2: Display with merging":
         st.markdown("---")
         
     if st.button("Export CSV"):
-        csv_data = df_view.to_csv(encoding='utf-8-sig', index=False).encode('utf-8-sig')
+        csv_data = format_dates(df_view, DATE_DISPLAY_FORMAT).to_csv(encoding='utf-8-sig', index=False).encode('utf-8-sig')
         st.download_button(
             label="Download CSV",
             data=BytesIO(csv_data),
@@ -961,18 +552,10 @@ elif selected_option == "Option 2: Display with merging":
             )
 
     if st.button("Generate ReportA4"):
-        pdf_data = generate_pdf2(df_view, project_name)
-        st.download_button(
-            label="Download PDF Report",
-            data=pdf_data,
-            file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReport_{project_name}.pdf",
-            mime="application/pdf"
-        )
+        queue_report(generate_pdf2, format_dates(df_view, DATE_DISPLAY_FORMAT), project_name,
+                     file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReport_{project_name}.pdf")
     if st.button("Generate Report With Plan"):
-        pdf_data = generate_pdf3(df_view, project_name)
-        st.download_button(
-            label="Download PDF Report",
-            data=pdf_data,
-            file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReportWithPlan_{project_name}.pdf",
-            mime="application/pdf"
-        )
\ No newline at end of file
+        queue_report(generate_pdf3, format_dates(df_view, DATE_DISPLAY_FORMAT), project_name,
+                     file_name=f"{datetime.datetime.now().strftime('%Y%m%d')}_PDF-ClashNoteReportWithPlan_{project_name}.pdf")
+
+show_report_jobs()
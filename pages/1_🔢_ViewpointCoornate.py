@@ -1,6 +1,12 @@
 import streamlit as st
-import xml.etree.ElementTree as ET
+import zipfile
 from io import BytesIO
+from bimtools.parse_cache import file_digest
+from bimtools.report_output import ReportFile
+from bimtools.viewpoint_batch import member_viewpoints, rebase_zip, xml_members
+from bimtools.viewpoint_transform import (UNIT_METRES, RebaseTransform, rewrite_viewpoints, transform_from_pair,
+                                          unit_scale)
+from bimtools.xml_ingest import POSITION_COLUMNS, viewpoint_table
 
 
 st.set_page_config(page_title='XML Viewpoint', page_icon=":1234:", layout='centered')
@@ -9,43 +15,99 @@ with open(css_file) as f:
     st.markdown("<style>{}</style>".format(f.read()), unsafe_allow_html=True)
 
 
-def parse_xml(file):
-    tree = ET.parse(file)
-    root = tree.getroot()
-    return root, tree
-
-def find_viewpoints_coordinates(root, old_viewpoint_name, new_viewpoint_name):
-    coordinates = {}
-    for view in root.iter('view'):
-        name = view.get('name')
-        if old_viewpoint_name in name or new_viewpoint_name in name:
-            camera = view.find('viewpoint').find('camera')
-            position = camera.find('position').find('pos3f')
-            coordinates[name] = (
-                float(position.get('x')),
-                float(position.get('y')),
-                float(position.get('z'))
-            )
-    return coordinates
-
-def adjust_view_coordinates(root, dx, dy, dz):
-    for view in root.iter('view'):
-        camera = view.find('viewpoint').find('camera')
-        position = camera.find('position').find('pos3f')
-        new_x = float(position.get('x')) + dx
-        new_y = float(position.get('y')) + dy
-        new_z = float(position.get('z')) + dz
-        position.set('x', str(new_x))
-        position.set('y', str(new_y))
-        position.set('z', str(new_z))
-    return root
-
-def xml_to_string(root):
-    return ET.tostring(root, encoding='utf-8')
+def find_viewpoints_coordinates(viewpoints, old_viewpoint_name, new_viewpoint_name):
+    matches = viewpoints[viewpoints['View Name'].isin([old_viewpoint_name, new_viewpoint_name])]
+    matches = matches.drop_duplicates(subset='View Name')
+    return dict(zip(matches['View Name'], map(tuple, matches[POSITION_COLUMNS].to_numpy().tolist())))
+
+def adjusted_viewpoints(uploaded_file, transform):
+    # The rebased file is kept for the session and only rewritten when the
+    # upload or the transform changes; the download reads it on request
+    key = (file_digest(uploaded_file), transform)
+    adjusted = st.session_state.get('adjusted_viewpoints')
+    if adjusted is None or adjusted[0] != key:
+        if adjusted is not None:
+            adjusted[1].close()
+        output = ReportFile(suffix='.xml')
+        rewrite_viewpoints(uploaded_file, transform, output)
+        adjusted = (key, output)
+        st.session_state.adjusted_viewpoints = adjusted
+    return adjusted[1]
+
+def batch_rebase():
+    zip_file = st.file_uploader("Upload ZIP of XML files", type="zip")
+    if zip_file is None:
+        return
+    try:
+        members = xml_members(zip_file)
+    except zipfile.BadZipFile:
+        st.error("The uploaded file is not a valid ZIP.")
+        return
+    if not members:
+        st.error("No XML files found in the ZIP.")
+        return
+
+    rotation = st.number_input("Rotation about Z (degrees)", value=0.0, step=1.0)
+    from_unit = st.selectbox("Exported in", list(UNIT_METRES))
+    to_unit = st.selectbox("Rebase to", list(UNIT_METRES))
+    scale = unit_scale(from_unit, to_unit)
+
+    rebase_by = st.radio("Rebase by", ["Reference viewpoint pair", "Offset"], horizontal=True)
+    if rebase_by == "Offset":
+        offset = (st.number_input("Offset X", value=0.0, format="%.6f"),
+                  st.number_input("Offset Y", value=0.0, format="%.6f"),
+                  st.number_input("Offset Z", value=0.0, format="%.6f"))
+        transform = RebaseTransform(offset, rotation, scale)
+    else:
+        reference = st.selectbox("XML with the reference viewpoints", members)
+        old_viewpoint_name = st.text_input("Enter old viewpoint name")
+        new_viewpoint_name = st.text_input("Enter new viewpoint name")
+        if not (old_viewpoint_name and new_viewpoint_name):
+            return
+        coordinates = find_viewpoints_coordinates(member_viewpoints(zip_file, reference),
+                                                  old_viewpoint_name, new_viewpoint_name)
+        if len(coordinates) != 2:
+            st.error("Unable to find the specified old and new viewpoints.")
+            return
+        transform = transform_from_pair(coordinates[old_viewpoint_name], coordinates[new_viewpoint_name],
+                                        rotation, scale)
+        dx, dy, dz = transform.offset
+        st.write(f"Distance X: {dx}")
+        st.write(f"Distance Y: {dy}")
+        st.write(f"Distance Z: {dz}")
+
+    key = (file_digest(zip_file), transform)
+    if st.button(f"Rebase {len(members)} XML files"):
+        previous = st.session_state.pop('rebased_zip', None)
+        if previous is not None:
+            previous[1].close()
+        output = ReportFile(suffix='.zip')
+        with st.spinner("Rebasing viewpoints..."):
+            summary = rebase_zip(zip_file, transform, output)
+        st.session_state.rebased_zip = (key, output, summary)
+
+    rebased = st.session_state.get('rebased_zip')
+    if rebased is not None and rebased[0] == key:
+        _, output, summary = rebased
+        st.dataframe(summary, hide_index=True)
+        failed = summary['Error'].notna().sum()
+        if failed:
+            st.warning(f"{failed} file(s) could not be read and are not in the ZIP.")
+        st.download_button(
+            label="Download Rebased ZIP",
+            data=output.reader,
+            file_name="rebased_viewpoints.zip",
+            mime="application/zip",
+            on_click='ignore'
+        )
 
 # Streamlit UI
 st.title("XML Viewpoint Coordinate Adjuster")
 
+if st.radio("Adjust", ["Single XML", "Batch ZIP of XMLs"], horizontal=True) == "Batch ZIP of XMLs":
+    batch_rebase()
+    st.stop()
+
 uploaded_file = st.file_uploader("Upload XML file", type="xml")
 
 if uploaded_file is not None:
@@ -53,29 +115,31 @@ if uploaded_file is not None:
     new_viewpoint_name = st.text_input("Enter new viewpoint name")
     
     if old_viewpoint_name and new_viewpoint_name:
-        root, tree = parse_xml(uploaded_file)
-        coordinates = find_viewpoints_coordinates(root, old_viewpoint_name, new_viewpoint_name)
+        viewpoints = viewpoint_table(uploaded_file)
+        coordinates = find_viewpoints_coordinates(viewpoints, old_viewpoint_name, new_viewpoint_name)
         
+        rotation = st.number_input("Rotation about Z (degrees)", value=0.0, step=1.0)
+        from_unit = st.selectbox("Exported in", list(UNIT_METRES))
+        to_unit = st.selectbox("Rebase to", list(UNIT_METRES))
+
         if len(coordinates) == 2:
-            old_coords = coordinates.get(old_viewpoint_name)
-            new_coords = coordinates.get(new_viewpoint_name)
-            dx = new_coords[0] - old_coords[0]
-            dy = new_coords[1] - old_coords[1]
-            dz = new_coords[2] - old_coords[2]
-            
+            transform = transform_from_pair(coordinates[old_viewpoint_name], coordinates[new_viewpoint_name],
+                                            rotation, unit_scale(from_unit, to_unit))
+            dx, dy, dz = transform.offset
+
             st.write(f"Distance X: {dx}")
             st.write(f"Distance Y: {dy}")
             st.write(f"Distance Z: {dz}")
-            
+
             # Adjust other views' coordinates
-            adjusted_root = adjust_view_coordinates(root, dx, dy, dz)
-            adjusted_xml = xml_to_string(adjusted_root)
+            adjusted_xml = adjusted_viewpoints(uploaded_file, transform)
             
             st.download_button(
                 label="Download Adjusted XML",
-                data=adjusted_xml,
+                data=adjusted_xml.reader,
                 file_name="adjusted_viewpoints.xml",
-                mime="text/xml"
+                mime="text/xml",
+                on_click='ignore'
             )
         else:
             st.error("Unable to find the specified old and new viewpoints.")
@@ -22,6 +22,10 @@ import os
 import shutil
 import tempfile
 from bs4 import BeautifulSoup
+from bimtools.job_panel import image_quality_options, image_size_text
+from bimtools.pdf_images import shared_image
+from bimtools.report_resources import report_resources
+from bimtools.thumbnails import DEFAULT_IMAGE_QUALITY, pdf_image_sizes, total_image_bytes
 EXTRACTED_FLAG = False
 # Set up the page
 st.set_page_config(page_title='Follow Up Clash For Cloud 11', page_icon=":1234:", layout='centered')
@@ -29,8 +33,7 @@ css_file = "styles/main.css"
 with open(css_file) as f:
     st.markdown("<style>{}</style>".format(f.read()), unsafe_allow_html=True)
 st.title('Follow Up Clash Report For Cloud 11')
-pdfmetrics.registerFont(TTFont('Sarabun', r'./Font/THSarabunNew.ttf'))
-pdfmetrics.registerFont(TTFont('Sarabun-Bold', r'./Font/THSarabunNew Bold.ttf'))
+report_resources.register_fonts()
 image_dict = {}
 
 def extract_images_from_zip(uploaded_zip_file):
@@ -67,7 +70,7 @@ def extract_file_name(url):
     else:
         return url
     
-def generate_pdf(df, project_name):
+def generate_pdf(df, project_name, image_quality=DEFAULT_IMAGE_QUALITY):
     class MyDocTemplate(BaseDocTemplate):
         def __init__(self, filename, **kwargs):
             BaseDocTemplate.__init__(self, filename, **kwargs)
@@ -79,13 +82,12 @@ def generate_pdf(df, project_name):
             self.addPageTemplates([template])
 
         def add_page_decorations(self, canvas, doc):
-            with pil_image.open(logo_path) as img:
-                width, height = img.size
+            width, height = report_resources.logo_size
             aspect = width / height
             new_height = 0.25 * inch
             new_width = new_height * aspect
             
-            canvas.drawImage(logo_path, 0.2*inch, doc.height + 1.5*inch, width=new_width, height=new_height)
+            canvas.drawImage(report_resources.logo_path, 0.2*inch, doc.height + 1.5*inch, width=new_width, height=new_height)
 
             canvas.setFont("Sarabun-Bold", 30)
             canvas.drawCentredString(doc.width/2 + 0.5*inch, doc.height + 1.25*inch + 0.25*inch, project_name)
@@ -94,7 +96,6 @@ def generate_pdf(df, project_name):
             canvas.setFont("Sarabun-Bold", 10)
             canvas.drawRightString(doc.width + inch, doc.height + inch + 0.75*inch, f"Generated on: {timestamp}")
 
-    logo_path = r"./Media/1-Aurecon-logo-colour-RGB-Positive.png"
 
     #desktop_path = os.path.join(os.path.expanduser('~'), 'Desktop')
     #output_file = os.path.join(desktop_path, f"{time.strftime('%Y%m%d')}_ClashReport_{project_name}.pdf")
@@ -104,26 +105,14 @@ def generate_pdf(df, project_name):
 
 
 
-    styles = getSampleStyleSheet()
-    cell_style = styles["Normal"]
-    cell_style.fontName = "Sarabun"
-    cell_style.alignment = TA_LEFT
+    styles = report_resources.styles
+    cell_style = styles["Cell"]
 
     
     content = []
 
         
-    header_style = ParagraphStyle(
-        "HeaderStyle",
-        parent=styles["Normal"],
-        fontName="Sarabun-Bold",
-        fontSize=18,
-        textColor=colors.white,
-        alignment=TA_LEFT,
-        spaceAfter=12,
-        leftIndent=6,
-        leading=16,
-    )
+    header_style = styles["Header"]
 
     table_style = [
         ('BACKGROUND', (0, 0), (-1, 0), colors.limegreen),
@@ -155,15 +144,15 @@ def generate_pdf(df, project_name):
 
         if img_name_designer != "Image not found" and img_name_designer in image_dict:
             img_data_designer = BytesIO(image_dict[img_name_designer])
-            img_designer = ReportlabImage(img_data_designer, width=2*inch, height=2*inch)
+            img_designer = shared_image(img_data_designer, 2*inch, image_quality)
 
         if img_name_combine_shop != "Image not found" and img_name_combine_shop in image_dict:
             img_data_combine_shop = BytesIO(image_dict[img_name_combine_shop])
-            img_combine_shop = ReportlabImage(img_data_combine_shop, width=2*inch, height=2*inch)
+            img_combine_shop = shared_image(img_data_combine_shop, 2*inch, image_quality)
 
         if img_name_solution != "Image not found" and img_name_solution in image_dict:
             img_data_solution = BytesIO(image_dict[img_name_solution])
-            img_solution = ReportlabImage(img_data_solution, width=2*inch, height=2*inch)
+            img_solution = shared_image(img_data_solution, 2*inch, image_quality)
 
         row_data = [
             Paragraph(str(row["ID"]), cell_style),
@@ -238,12 +227,17 @@ if csv_file and uploaded_zip:
             mime="text/csv"
         )
 
+    image_quality = image_quality_options()
     if st.button("Generate Report"):
-        df_data = generate_pdf(data, project_name)
+        df_data = generate_pdf(data, project_name, image_quality=image_quality)
         st.download_button(
             label="Download PDF Report",
             data=df_data,
             file_name=f"{time.strftime('%Y%m%d')}_Design-Coordination_Tracking-Report_{project_name}.pdf",
                 mime="application/pdf"
             )
+        images = {name: BytesIO(img_data) for name, img_data in image_dict.items()}
+        image_sizes = pdf_image_sizes(data, ["Photo", "Check TOC model", "Solution"], 2*inch,
+                                      image_quality, lookup=images)
+        st.caption(image_size_text(total_image_bytes(image_sizes)))
 
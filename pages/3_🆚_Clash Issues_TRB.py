@@ -18,6 +18,7 @@ import shutil
 import tempfile
 from bs4 import BeautifulSoup
 import datetime
+from bimtools.report_resources import report_resources
 
 EXTRACTED_FLAG = False
 
@@ -35,8 +36,7 @@ css_file = "styles/main.css"
 with open(css_file) as f:
     st.markdown("<style>{}</style>".format(f.read()), unsafe_allow_html=True)
 
-pdfmetrics.registerFont(TTFont('Sarabun', r'./Font/THSarabunNew.ttf'))
-pdfmetrics.registerFont(TTFont('Sarabun-Bold', r'./Font/THSarabunNew Bold.ttf'))
+report_resources.register_fonts()
 
 def validate_date(date_str):
     """Check if the provided date string is in the format 'YYYY-MM-DD'."""
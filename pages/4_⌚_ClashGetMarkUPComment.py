@@ -1,7 +1,6 @@
 import streamlit as st
-from xml.etree import ElementTree as ET
-import pandas as pd
 from io import BytesIO
+from bimtools.xml_ingest import viewpoint_table
 
 st.set_page_config(page_title='File Combiner and Transformer', page_icon=":watch:", layout='centered')
 css_file = "styles/main.css"
@@ -13,20 +12,8 @@ st.title('XML View Name and Comment Extractor')
 uploaded_file = st.file_uploader("Choose an XML file", type="xml")
 
 if uploaded_file is not None:
-    # Parse the uploaded XML file
-    tree = ET.parse(uploaded_file)
-    root = tree.getroot()
-
-    # Extract view names and comments
-    data = []
-    for view in root.findall('.//view'):
-        view_name = view.get('name')
-        rltext = view.find('.//rltext/text')
-        comment = rltext.text if rltext is not None else None
-        data.append({'View Name': view_name, 'Comment': comment})
-
-    # Create a DataFrame
-    df = pd.DataFrame(data)
+    # View names and the first redline text of each view
+    df = viewpoint_table(uploaded_file)[['View Name', 'Redline']].rename(columns={'Redline': 'Comment'})
 
     # Display the first few rows of the DataFrame
     st.write(df.head())
@@ -1,8 +1,7 @@
 import streamlit as st
 import pandas as pd
 from io import BytesIO
-from PyPDF2 import PdfReader, PdfWriter
-import io
+from bimtools.pdf_combine import combine_pdfs
 
 st.set_page_config(page_title='PDF Combiner', page_icon=":linked_paperclips:", layout='wide')
 
@@ -11,20 +10,6 @@ with open(css_file) as f:
     st.markdown("<style>{}</style>".format(f.read()), unsafe_allow_html=True)
 
 
-def combine_pdfs(uploaded_files):
-    merger = PdfWriter()
-
-    for file in uploaded_files:
-        pdf = PdfReader(file)
-        for page in pdf.pages:
-            merger.add_page(page)
-
-    combined_pdf_stream = io.BytesIO()
-    merger.write(combined_pdf_stream)
-    combined_pdf_stream.seek(0)
-    
-    return combined_pdf_stream
-
 st.title("PDF Combiner")
 
 filename = st.text_input("Enter the filename for the merged PDF:", "")
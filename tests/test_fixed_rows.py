@@ -0,0 +1,86 @@
+import re
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.lib import colors
+
+from bimtools import fixed_rows
+from bimtools.fixed_rows import MAX_HEIGHT
+from bimtools.report_resources import report_resources
+from bimtools.report_template import DetailField, HeaderColours, ImageSlot, NoteReport, plan_report
+from bimtools.row_cache import row_cache
+from bimtools.thumbnails import DEFAULT_IMAGE_QUALITY
+
+
+HEADER = HeaderColours(colors.HexColor('#1F3864'), colors.white)
+SLOTS = [ImageSlot('Image', 'Image', 150, 'Image not found')]
+DETAILS = [DetailField('Clash ID', 'Clash ID'), DetailField('View Name', 'View Name'),
+           DetailField('Issues Status', 'Issues Status')]
+
+
+@pytest.fixture(autouse=True)
+def fonts(repo_root):
+    report_resources.register_fonts()
+    row_cache.clear()
+
+
+def _png(colour):
+    image = BytesIO()
+    Image.new('RGB', (80, 60), colour).save(image, format='PNG')
+    return image
+
+
+def _frame(rows):
+    # Some rows without an image, one with a note filling most of a page
+    notes = [f"Note {idx}\nsecond line of note {idx}" for idx in range(rows)]
+    notes[7] = "\n".join(f"long note line {line}" for line in range(25))
+    return pd.DataFrame({
+        'Clash ID': [f"C{idx:03d}" for idx in range(rows)],
+        'Image': [_png((idx * 37 % 256, 90, 160)) if idx % 5 else 'Image not found' for idx in range(rows)],
+        'View Name': [f"Level {idx % 4} / Zone {idx % 3} / view number {idx} with a long name to wrap"
+                      for idx in range(rows)],
+        'Issues Status': ['New' if idx % 2 else 'Resolved' for idx in range(rows)],
+        'Notes': notes,
+    })
+
+
+def _pages(pdf):
+    pages = []
+    for page in PdfReader(BytesIO(pdf)).pages:
+        # The text objects differ, so does the spacing text extraction guesses
+        text = re.sub(r'\s+', '', re.sub(r'Generated on: \S+', '', page.extract_text()))
+        images = sorted(name for name in page['/Resources'].get('/XObject', {}) if '-' in name)
+        pages.append((text, images))
+    return pages
+
+
+@pytest.mark.parametrize('make', [
+    lambda direct: NoteReport(SLOTS, DETAILS, [0.1, 0.35, 0.3, 0.25], HEADER, direct=direct),
+    lambda direct: plan_report(SLOTS, DETAILS, [0.1, 0.35, 0.3, 0.25], HEADER, direct=direct),
+], ids=['a4', 'plan'])
+def test_direct_rows_match_the_table_layout(make):
+    direct, tables = make(True), make(False)
+    assert direct.layout is not None and tables.layout is None
+    frame = _frame(40)
+
+    expected = _pages(tables(frame, 'Project'))
+    assert len(expected) > 3
+    assert _pages(direct(frame, 'Project')) == expected
+    # Laid out rows come from the row cache the second time
+    assert _pages(direct(frame, 'Project', start=1)) == expected
+
+
+def test_rows_whose_notes_overflow_use_table():
+    report = NoteReport(SLOTS, DETAILS, [0.1, 0.35, 0.3, 0.25], HEADER, direct=True)
+    frame = _frame(8)
+    cells = [report.row_cells(row, DEFAULT_IMAGE_QUALITY) for _, row in frame.iterrows()]
+    assert report.layout.row(cells[1], MAX_HEIGHT) is not None
+    assert report.layout.row(cells[7], MAX_HEIGHT) is None
+
+
+def test_untested_reportlab_uses_table(monkeypatch):
+    monkeypatch.setattr(fixed_rows, 'REPORTLAB_INTERNALS', False)
+    assert NoteReport(SLOTS, DETAILS, [0.1, 0.35, 0.3, 0.25], HEADER, direct=True).layout is None
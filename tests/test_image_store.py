@@ -0,0 +1,54 @@
+import zipfile
+from io import BytesIO
+
+import pandas as pd
+
+from bimtools.image_store import resolve_images, session_image_store
+
+
+class Upload(BytesIO):
+    # What st.file_uploader hands out
+    def __init__(self, data, name, type, file_id):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.file_id = file_id
+
+
+def _zip_upload(file_id, names):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in names:
+            archive.writestr(f"shots/{name}", name.encode())
+    return Upload(buffer.getvalue(), 'shots.zip', 'application/zip', file_id)
+
+
+def test_store_is_kept_while_the_uploads_stay_the_same():
+    state = {}
+    frame = pd.DataFrame({'Image': ['a.png', 'b.png', 'missing.png']})
+    store = session_image_store([_zip_upload('one', ['a.png', 'b.png'])], state)
+    resolved, usage = resolve_images(frame, store, ['Image'])
+    assert usage.missing == ['missing.png']
+
+    # A rerun hands out new upload objects for the same files
+    again = session_image_store([_zip_upload('one', ['a.png', 'b.png'])], state)
+    assert again is store
+    rerun, _ = resolve_images(frame, again, ['Image'])
+    assert rerun['Image'][0] is resolved['Image'][0]
+    assert rerun['Image'][0].getvalue() == b'a.png'
+
+
+def test_new_uploads_get_a_new_store():
+    state = {}
+    store = session_image_store([_zip_upload('one', ['a.png'])], state)
+    other = session_image_store([_zip_upload('two', ['a.png'])], state)
+    assert other is not store
+    assert session_image_store([], state) is not other
+
+
+def test_unsupported_uploads_are_listed():
+    state = {}
+    image = Upload(b'png', 'c.png', 'image/png', 'three')
+    store = session_image_store([image, Upload(b'', 'notes.txt', 'text/plain', 'four')], state)
+    assert store['c.png'] is image
+    assert store.unsupported == ['text/plain']
@@ -0,0 +1,78 @@
+from io import BytesIO
+
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab import rl_config
+from reportlab.pdfgen.canvas import Canvas
+
+from bimtools import pdf_images
+from bimtools.pdf_images import draw_shared_image
+
+
+def _image(mode, colour, format='PNG'):
+    image = BytesIO()
+    Image.new(mode, (32, 16), colour).save(image, format=format)
+    return image.getvalue()
+
+
+def _xobjects(pdf):
+    return [{name: xobject.get_object() for name, xobject in page['/Resources']['/XObject'].items()}
+            for page in PdfReader(BytesIO(pdf)).pages]
+
+
+def test_image_is_embedded_once_per_document():
+    pdf = BytesIO()
+    canvas = Canvas(pdf)
+    data = _image('RGB', 'red')
+    for page in range(2):
+        draw_shared_image(canvas, 'shot-1', data, 10, 10, 64, 32)
+        draw_shared_image(canvas, 'shot-1', data, 100, 10, 64, 32)
+        canvas.showPage()
+    canvas.save()
+
+    pages = _xobjects(pdf.getvalue())
+    assert [list(page) for page in pages] == [['/FormXob.shot-1']] * 2
+    assert pages[0]['/FormXob.shot-1'].indirect_reference == pages[1]['/FormXob.shot-1'].indirect_reference
+    image = pages[0]['/FormXob.shot-1']
+    assert (image['/Width'], image['/Height']) == (32, 16)
+
+
+def test_transparent_image_keeps_its_soft_mask():
+    pdf = BytesIO()
+    canvas = Canvas(pdf)
+    draw_shared_image(canvas, 'shot-2', _image('RGBA', (255, 0, 0, 128)), 10, 10, 64, 32)
+    canvas.save()
+
+    image = _xobjects(pdf.getvalue())[0]['/FormXob.shot-2']
+    assert image['/SMask'].get_object()['/Subtype'] == '/Image'
+
+
+def test_images_are_binary_whatever_use_a85_says(monkeypatch):
+    monkeypatch.setattr(rl_config, 'useA85', 1)
+    pdf = BytesIO()
+    canvas = Canvas(pdf)
+    draw_shared_image(canvas, 'shot-3', _image('RGB', 'red', 'JPEG'), 10, 10, 64, 32)
+    draw_shared_image(canvas, 'shot-4', _image('RGBA', (255, 0, 0, 128)), 10, 10, 64, 32)
+    canvas.save()
+
+    images = _xobjects(pdf.getvalue())[0]
+    assert images['/FormXob.shot-3']['/Filter'] == ['/DCTDecode']
+    assert images['/FormXob.shot-4']['/Filter'] == ['/FlateDecode']
+    assert images['/FormXob.shot-4']['/SMask'].get_object()['/Filter'] == ['/FlateDecode']
+    assert rl_config.useA85 == 1
+
+
+def test_untested_reportlab_draws_through_draw_image(monkeypatch):
+    monkeypatch.setattr(pdf_images, 'REPORTLAB_INTERNALS', False)
+    pdf = BytesIO()
+    canvas = Canvas(pdf)
+    data = _image('RGB', 'red')
+    for page in range(2):
+        draw_shared_image(canvas, 'shot-5', data, 10, 10, 64, 32)
+        canvas.showPage()
+    canvas.save()
+
+    pages = _xobjects(pdf.getvalue())
+    assert len(pages[0]) == 1 and list(pages[0]) == list(pages[1])
+    name = list(pages[0])[0]
+    assert pages[0][name].indirect_reference == pages[1][name].indirect_reference
@@ -0,0 +1,42 @@
+import io
+import os
+
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from bimtools.report_output import ReportFile
+
+
+DATA = os.urandom(300000)
+
+
+@pytest.fixture(params=[1 << 20, 1000], ids=['in-memory', 'on-disk'])
+def report(request):
+    report = ReportFile(max_size=request.param)
+    report.write(DATA)
+    yield report
+    report.close()
+
+
+def test_readers_have_their_own_position(report):
+    first, second = report.reader(), report.reader()
+    assert first.read(10) == DATA[:10]
+    assert second.read(20) == DATA[:20]
+    assert first.read() == DATA[10:]
+    assert report.tell() == len(DATA)
+    assert report.size == len(DATA)
+
+
+def test_download_button_reads_the_whole_report(report):
+    data, _ = convert_data_to_bytes_and_infer_mime(report.reader(), ValueError())
+    assert data == DATA
+
+
+def test_reader_outlives_the_report_on_disk():
+    report = ReportFile(max_size=1000)
+    report.write(DATA)
+    reader = report.reader()
+    report.close()
+    reader.seek(-5, io.SEEK_END)
+    assert reader.read() == DATA[-5:]
+    reader.close()
@@ -0,0 +1,80 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.lib import colors
+
+from bimtools.report_resources import report_resources
+from bimtools.report_template import DetailField, HeaderColours, ImageSlot, NoteReport, WideReport
+from bimtools.thumbnails import ImageQuality
+
+
+HEADER = HeaderColours(colors.black, colors.white)
+# Off the default quality, so no variant cached by another test is reused
+QUALITY = ImageQuality(72, 70)
+
+
+@pytest.fixture(autouse=True)
+def fonts(repo_root):
+    # Done by each page script when it is loaded
+    report_resources.register_fonts()
+
+
+def _png(colour):
+    image = BytesIO()
+    Image.new('RGB', (64, 48), colour).save(image, format='PNG')
+    return image
+
+
+def _images(pdf):
+    reader = PdfReader(BytesIO(pdf))
+    names = set()
+    for page in reader.pages:
+        for name, xobject in page['/Resources'].get('/XObject', {}).items():
+            # Report images are named by content, size and quality; skip the logo
+            if xobject.get_object()['/Subtype'] == '/Image' and '-' in name:
+                names.add(name)
+    text = ''.join(page.extract_text() for page in reader.pages)
+    return names, text
+
+
+def _frame():
+    return pd.DataFrame({'Clash ID': ['C1', 'C2', 'C3'],
+                         'Image': ['a.png', 'b.png', 'gone.png'],
+                         'View Name': ['V1', 'V2', 'V3']})
+
+
+def test_wide_report_looks_image_names_up():
+    report = WideReport(['Clash ID', 'Image', 'View Name'], [100, 200, 100], HEADER)
+    lookup = {'a.png': _png('red'), 'b.png': _png('blue')}
+
+    names, text = _images(report(_frame(), 'Project', image_quality=QUALITY, images=lookup))
+    assert len(names) == 2
+    assert text.count('Image not found') == 1
+
+    # Without the lookup every name is reported missing, as before
+    names, text = _images(report(_frame(), 'Project', image_quality=QUALITY))
+    assert not names
+    assert text.count('Image not found') == 3
+
+
+def test_note_report_looks_image_names_up():
+    report = NoteReport([ImageSlot('Image', 'Image', 150, 'Image not found')],
+                        [DetailField('Clash ID', 'Clash ID'), DetailField('View', 'View Name')],
+                        [0.1, 0.4, 0.5], HEADER, notes=None)
+    names, text = _images(report(_frame(), 'Project', image_quality=QUALITY,
+                                 images={'a.png': _png('green'), 'b.png': _png('green')}))
+    # The same picture under two names is embedded once
+    assert len(names) == 1
+    assert text.count('Image not found') == 1
+
+
+def test_with_images_keeps_uploads_and_other_columns():
+    report = WideReport(['Clash ID', 'Image'], [100, 200], HEADER)
+    upload = _png('red')
+    frame = pd.DataFrame({'Clash ID': ['a.png'], 'Image': [upload]})
+    resolved = report.with_images(frame, {'a.png': _png('blue')})
+    assert resolved['Image'][0] is upload
+    assert resolved['Clash ID'][0] == 'a.png'
@@ -0,0 +1,83 @@
+import threading
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.lib import colors
+from reportlab.platypus import Paragraph
+
+from bimtools.fixed_rows import FixedRow
+from bimtools.pdf_images import SharedImage
+from bimtools.report_resources import report_resources
+from bimtools.report_template import DetailField, HeaderColours, ImageSlot, NoteReport, WideReport
+from bimtools.row_cache import cached_rows, row_cache, store_rows
+
+
+HEADER = HeaderColours(colors.black, colors.white)
+
+
+@pytest.fixture(autouse=True)
+def fonts(repo_root):
+    report_resources.register_fonts()
+    row_cache.clear()
+
+
+def _png(colour):
+    image = BytesIO()
+    Image.new('RGB', (64, 48), colour).save(image, format='PNG')
+    return image
+
+
+def _text(pdf):
+    # Headers carry a timestamp, compare everything else
+    lines = ''.join(page.extract_text() for page in PdfReader(BytesIO(pdf)).pages).splitlines()
+    return [line for line in lines if 'Generated on' not in line]
+
+
+def _frame(rows):
+    return pd.DataFrame({'Clash ID': [f"C{idx}" for idx in range(rows)],
+                         'Image': [_png((idx * 40 % 256, 0, 0)) for idx in range(rows)],
+                         'View Name': [f"View {idx} " * 3 for idx in range(rows)]})
+
+
+def test_cached_rows_never_hand_out_the_same_flowables():
+    frame = _frame(2)
+    build = lambda row: [Paragraph(row['View Name'], report_resources.styles['Cell'])]
+    keys, first, heights = cached_rows('test', frame, build)
+    store_rows(keys, first, [10.0, 20.0])
+
+    keys, second, heights = cached_rows('test', frame, build)
+    assert heights == [10.0, 20.0]
+    assert all(a[0] is not b[0] for a, b in zip(first, second))
+    assert all(entry[0] is None for entry, _ in row_cache.entries.values())
+
+
+def test_row_entries_count_their_image_data():
+    image = SharedImage('name', b'\0' * 100000, 10, 10)
+    store_rows(['key'], [FixedRow(10.0, [('Sarabun', 10, None, 0, 0, 'text', 0)], [(image, 0, 0)])], [10.0])
+    assert row_cache.total_bytes > 100000
+
+
+@pytest.mark.parametrize('report', [
+    WideReport(['Clash ID', 'Image', 'View Name'], [100, 200, 300], HEADER),
+    NoteReport([ImageSlot('Image', 'Image', 150, 'Image not found')],
+               [DetailField('Clash ID', 'Clash ID'), DetailField('View', 'View Name')],
+               [0.1, 0.4, 0.5], HEADER, notes=None),
+], ids=['wide', 'note'])
+def test_concurrent_builds_match_a_single_build(report):
+    frame = _frame(30)
+    # The first build fills the row cache, the others all read it at once
+    expected = _text(report(frame, 'Project'))
+    results = [None] * 4
+
+    def build(idx):
+        results[idx] = report(frame, 'Project')
+
+    threads = [threading.Thread(target=build, args=(idx,)) for idx in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(_text(result) == expected for result in results)
@@ -0,0 +1,101 @@
+import multiprocessing
+import threading
+import time
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from PyPDF2 import PdfReader
+from reportlab.lib import colors
+
+from bimtools.report_resources import report_resources
+from bimtools.report_template import DetailField, HeaderColours, NoteReport
+from bimtools.row_cache import fragment_cache, row_cache
+from bimtools.sharding import render_sharded
+
+
+pytestmark = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                                reason="shards only render in parallel with fork")
+
+REPORT = NoteReport([], [DetailField('Clash ID', 'Clash ID'), DetailField('View', 'View Name')],
+                    [0.2, 0.8], HeaderColours(colors.black, colors.white), notes=None)
+
+
+@pytest.fixture(autouse=True)
+def fonts(repo_root):
+    report_resources.register_fonts()
+    row_cache.clear()
+    fragment_cache.clear()
+
+
+def _frame(rows, name='View'):
+    return pd.DataFrame({'Clash ID': [f"C{idx}" for idx in range(rows)],
+                         'View Name': [f"{name} {idx}" for idx in range(rows)]})
+
+
+def _pages(pdf):
+    return [page.extract_text() for page in PdfReader(BytesIO(pdf)).pages]
+
+
+def _text(pdf):
+    return ''.join(_pages(pdf))
+
+
+def test_shards_match_a_single_build():
+    frame = _frame(60)
+    sharded = render_sharded(REPORT, frame, 'Project', rows_per_shard=20, workers=3)
+    assert _text(sharded) == _text(REPORT(frame, 'Project'))
+
+
+def test_shards_end_on_page_boundaries():
+    # 23 rows do not fill a whole number of pages, shards cut there would
+    # leave a part filled page at the end of each
+    frame = _frame(600)
+    expected = _pages(REPORT(frame, 'Project'))
+    assert _pages(render_sharded(REPORT, frame, 'Project', rows_per_shard=23, workers=3)) == expected
+
+
+def test_shards_are_only_cached_when_reused():
+    render_sharded(REPORT, _frame(60), 'Project', rows_per_shard=20, workers=3, reuse_shards=False)
+    assert not fragment_cache.entries
+    render_sharded(REPORT, _frame(60), 'Project', rows_per_shard=20, workers=3)
+    assert len(fragment_cache.entries) > 1
+
+
+def test_concurrent_sharded_builds_keep_their_own_rows():
+    frames = [_frame(40, name) for name in ('Alpha', 'Beta', 'Gamma')]
+    results = [None] * len(frames)
+
+    def build(idx):
+        results[idx] = render_sharded(REPORT, frames[idx], 'Project', rows_per_shard=10, workers=2)
+
+    threads = [threading.Thread(target=build, args=(idx,)) for idx in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for frame, result in zip(frames, results):
+        assert _text(result) == _text(REPORT(frame, 'Project'))
+
+
+def test_fork_waits_for_cache_locks_held_by_other_threads():
+    # Forked while another thread holds the row cache lock, a worker would
+    # wait for it forever
+    done = threading.Event()
+
+    def hold():
+        while not done.is_set():
+            with row_cache.lock:
+                time.sleep(0.01)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        build = threading.Thread(target=render_sharded, args=(REPORT, _frame(40), 'Project'),
+                                 kwargs={'rows_per_shard': 10, 'workers': 2}, daemon=True)
+        build.start()
+        build.join(timeout=120)
+        assert not build.is_alive()
+    finally:
+        done.set()
+        holder.join()
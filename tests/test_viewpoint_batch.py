@@ -0,0 +1,82 @@
+import io
+import struct
+import zipfile
+
+import pytest
+
+from bimtools.viewpoint_batch import rebase_zip
+from bimtools.viewpoint_transform import RebaseTransform
+
+
+GOOD = (b'<?xml version="1.0" encoding="UTF-8"?>\n<exchange><viewpoints><viewfolder name="A">'
+        b'<view name="V1"><viewpoint><camera><position><pos3f x="1" y="2" z="3"/></position>'
+        b'</camera></viewpoint></view></viewfolder></viewpoints></exchange>\n')
+SHIFT = RebaseTransform((1.0, 1.0, 1.0), 0.0, 1.0)
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _patch_member(data, name, flags=None, method=None, corrupt=False):
+    # Rewrite the local and central headers (and maybe the data) of one member
+    data = bytearray(data)
+    info = zipfile.ZipFile(io.BytesIO(bytes(data))).getinfo(name)
+    local = info.header_offset
+    name_length, extra_length = struct.unpack('<HH', data[local + 26:local + 30])
+    if corrupt:
+        data[local + 30 + name_length + extra_length] ^= 0xff
+    central = data.index(b'PK\x01\x02')
+    while data[central + 46:central + 46 + len(name)] != name.encode():
+        central = data.index(b'PK\x01\x02', central + 4)
+    if flags is not None:
+        struct.pack_into('<H', data, local + 6, flags)
+        struct.pack_into('<H', data, central + 8, flags)
+    if method is not None:
+        struct.pack_into('<H', data, local + 8, method)
+        struct.pack_into('<H', data, central + 10, method)
+    return bytes(data)
+
+
+def _rebase(data, workers=1):
+    output = io.BytesIO()
+    summary = rebase_zip(io.BytesIO(data), SHIFT, output, workers=workers)
+    with zipfile.ZipFile(io.BytesIO(output.getvalue())) as rebased:
+        return summary.set_index('File'), {name: rebased.read(name) for name in rebased.namelist()}
+
+
+def test_good_member_is_rebased():
+    summary, files = _rebase(_zip({'a.xml': GOOD}))
+    assert summary.loc['a.xml', 'Views'] == 1
+    assert summary['Error'].isna().all()
+    assert b'<pos3f x="2.0" y="3.0" z="4.0"/>' in files['a.xml']
+
+
+@pytest.mark.parametrize('data', [
+    GOOD[:len(GOOD) // 2],
+    GOOD.replace(b'</viewfolder>', b'</viewpoints>', 1),
+    b'This is not XML at all',
+    b'',
+], ids=['truncated', 'mismatched', 'not-xml', 'empty'])
+def test_malformed_member_is_reported_and_left_out(data):
+    summary, files = _rebase(_zip({'a.xml': GOOD, 'bad.xml': data}))
+    assert 'Not well-formed XML' in summary.loc['bad.xml', 'Error']
+    assert list(files) == ['a.xml']
+
+
+@pytest.mark.parametrize('patch', [
+    {'corrupt': True},
+    {'flags': 0x1},
+    {'method': 99},
+], ids=['bad-crc', 'encrypted', 'unsupported-compression'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_unreadable_member_does_not_stop_the_batch(patch, workers):
+    data = _patch_member(_zip({'a.xml': GOOD, 'bad.xml': GOOD, 'c.xml': GOOD}), 'bad.xml', **patch)
+    summary, files = _rebase(data, workers)
+    assert summary.loc['bad.xml', 'Error'].startswith('Cannot read from ZIP')
+    assert summary.loc[['a.xml', 'c.xml'], 'Error'].isna().all()
+    assert sorted(files) == ['a.xml', 'c.xml']
@@ -0,0 +1,18 @@
+import numpy as np
+
+from bimtools.viewpoint_transform import transform_from_pair, transform_points, unit_scale
+
+
+def test_pair_without_rotation_or_scale_is_a_shift():
+    transform = transform_from_pair((1.0, 2.0, 3.0), (10.5, -20.25, 3.125))
+    assert transform.offset == (9.5, -22.25, 0.125)
+
+
+def test_pair_round_trips_in_target_units():
+    old, new = (12000.0, -3500.0, 250.0), (15250.0, 1200.0, 1250.0)
+    scale = unit_scale('mm', 'm')
+    assert scale == 0.001
+    for rotation in (0.0, 30.0):
+        transform = transform_from_pair(old, new, rotation, scale)
+        moved = transform_points(np.array([old]), transform)[0]
+        np.testing.assert_allclose(moved, np.array(new) * scale, rtol=0, atol=1e-9)